@@ -0,0 +1,137 @@
+# benchmarks/html_extraction.py
+#
+# Compares the original BeautifulSoup scraping path with the html_text
+# backends on saved pages. Run from data-processing/:
+#
+#     python -m benchmarks.html_extraction --pages path/to/saved/html --repeat 5
+#
+# Without --pages, synthetic recipe pages are generated.
+
+import argparse
+import re
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+from src.html_text import BACKENDS
+from src.units import UNITS
+from src.web_search import DENSITY_PATTERN
+
+# The four density patterns as the scraper used to apply them, one after the other
+LEGACY_DENSITY_PATTERNS = [
+    r'(\d+(?:\.\d+)?)\s*g(?:rams)?\s*per\s*cup',
+    r'(\d+(?:\.\d+)?)\s*g(?:rams)?\s*/\s*cup',
+    r'cup\s*of\s*[^.]*?weighs\s*(\d+(?:\.\d+)?)\s*g(?:rams)?',
+    r'density\s*of\s*[^.]*?is\s*(\d+(?:\.\d+)?)\s*g(?:rams)?\s*per\s*cup'
+]
+
+INGREDIENT = "sugar"
+QUANTITY_PATTERN = re.compile(
+    r'(\d+(?:\.\d+)?)\s*' + UNITS.unit_pattern + r'\s+(?:of\s+)?[^,.]*?' + re.escape(INGREDIENT),
+    re.IGNORECASE
+)
+
+def legacy_scrape(html: str) -> Tuple[Optional[float], Optional[str]]:
+    """Density and quantity the way the scraper found them before html_text."""
+    soup = BeautifulSoup(html, 'html.parser')
+    text = soup.get_text()
+    density = None
+    for pattern in LEGACY_DENSITY_PATTERNS:
+        matches = re.search(pattern, text, re.IGNORECASE)
+        if matches:
+            density = float(matches.group(1))
+            break
+
+    quantity = None
+    soup = BeautifulSoup(html, 'html.parser')
+    for section in soup.find_all(['li', 'p']):
+        text = section.get_text()
+        if INGREDIENT in text.lower():
+            matches = QUANTITY_PATTERN.search(text)
+            if matches:
+                quantity = matches.group(0)
+                break
+    return density, quantity
+
+def backend_scrape(extract: Callable[[str], str], html: str) -> Tuple[Optional[float], Optional[str]]:
+    """Density and quantity from one extraction pass with the given backend."""
+    text = extract(html)
+    density = None
+    matches = DENSITY_PATTERN.search(text)
+    if matches:
+        density = float(next(group for group in matches.groups() if group is not None))
+
+    quantity = None
+    for line in text.split('\n'):
+        if INGREDIENT in line.lower():
+            matches = QUANTITY_PATTERN.search(line)
+            if matches:
+                quantity = matches.group(0)
+                break
+    return density, quantity
+
+def synthetic_pages(count: int) -> List[str]:
+    """Recipe-like pages with scripts, navigation and an ingredient list."""
+    pages = []
+    for n in range(count):
+        script = "<script>" + "var tracking = {id: 12345, cups: '1 cup sugar'};" * 200 + "</script>"
+        style = "<style>" + ".recipe { margin: 0 auto; }" * 200 + "</style>"
+        nav = "<nav><ul>" + "".join(f"<li><a href='/c/{i}'>Category {i}</a></li>" for i in range(80)) + "</ul></nav>"
+        comments = "".join(
+            f"<div class='comment'><p>Comment {i}: I loved this, made it for my family twice!</p></div>"
+            for i in range(150)
+        )
+        ingredients = "<ul class='ingredients'>" + "".join([
+            "<li>2 <b>cups</b> all-purpose flour</li>",
+            f"<li>{n % 3 + 1} cups granulated sugar</li>",
+            "<li>1 teaspoon vanilla extract</li>",
+        ]) + "</ul>"
+        notes = f"<p>A cup of sugar weighs {200 + n % 5} grams, so weigh it if you can.</p>"
+        pages.append(
+            f"<html><head><title>Cake {n}</title>{style}{script}</head><body>{nav}"
+            f"<article><h1>Cake {n}</h1>{ingredients}{notes}</article>{comments}</body></html>"
+        )
+    return pages
+
+def load_pages(directory: Optional[str], count: int) -> List[str]:
+    if directory is None:
+        return synthetic_pages(count)
+    paths = sorted(Path(directory).glob("*.htm*"))
+    return [path.read_text(encoding='utf-8', errors='replace') for path in paths]
+
+def time_scraper(scrape: Callable[[str], tuple], pages: List[str], repeat: int) -> Tuple[float, list]:
+    """Best total seconds over repeat runs, and the results of the last run."""
+    best = float('inf')
+    results = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [scrape(html) for html in pages]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HTML text extraction backends')
+    parser.add_argument('--pages', help='Directory of saved .html pages (default: synthetic pages)')
+    parser.add_argument('--count', type=int, default=50, help='Number of synthetic pages')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per backend; the best is reported')
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages, args.count)
+    if not pages:
+        print("No pages to benchmark.")
+        return
+    print(f"{len(pages)} pages, {sum(len(html) for html in pages) / len(pages) / 1024:.0f} KiB on average")
+
+    baseline, expected = time_scraper(legacy_scrape, pages, args.repeat)
+    print(f"{'legacy bs4':>12}: {baseline / len(pages) * 1000:7.2f} ms/page")
+
+    for name, extract in BACKENDS.items():
+        seconds, results = time_scraper(lambda html: backend_scrape(extract, html), pages, args.repeat)
+        agree = sum(result == legacy for result, legacy in zip(results, expected))
+        print(f"{name:>12}: {seconds / len(pages) * 1000:7.2f} ms/page  "
+              f"{baseline / seconds:5.1f}x  same result on {agree}/{len(pages)} pages")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/list_decoding.py
+#
+# Compares decoding the ingredients column with eval(), as the parser used
+# to, against ast.literal_eval and the list_literal decoders. Run from
+# data-processing/:
+#
+#     python -m benchmarks.list_decoding --input data/input/recipes.csv --rows 200000
+#
+# The column is repeated up to --rows rows so small inputs give stable timings.
+
+import argparse
+import ast
+import time
+from typing import Callable, List, Sequence, Tuple
+
+from src.list_literal import decode_list_column, decode_list_literal
+from src.main import read_recipes
+
+def eval_rows(values: Sequence[str]) -> List:
+    """The original decoding: eval() per row, comma split when that fails."""
+    decoded = []
+    for text in values:
+        try:
+            decoded.append(eval(text))
+        except:
+            decoded.append(text.split(','))
+    return decoded
+
+def literal_eval_rows(values: Sequence[str]) -> List:
+    decoded = []
+    for text in values:
+        try:
+            decoded.append(ast.literal_eval(text))
+        except (ValueError, SyntaxError):
+            decoded.append(text.split(','))
+    return decoded
+
+def decode_rows(values: Sequence[str]) -> List:
+    return [decode_list_literal(text) for text in values]
+
+DECODERS: List[Tuple[str, Callable[[Sequence[str]], List]]] = [
+    ("literal_eval", literal_eval_rows),
+    ("per row", decode_rows),
+    ("column", decode_list_column),
+]
+
+def time_decoder(decode: Callable[[Sequence[str]], List], values: List[str], repeat: int) -> Tuple[float, List]:
+    """Best total seconds over repeat runs, and the results of the last run."""
+    best = float('inf')
+    results = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = decode(values)
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ingredient list decoding')
+    parser.add_argument('--input', '-i', default='data/input/recipes.csv', help='Input CSV file path')
+    parser.add_argument('--rows', type=int, default=100000, help='Rows to decode, repeating the input as needed')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per decoder; the best is reported')
+    args = parser.parse_args()
+
+    df = read_recipes(args.input)
+    if df is None:
+        return
+    column = [value for value in df['ingredients'] if isinstance(value, str)]
+    if not column:
+        print("No ingredient lists to benchmark.")
+        return
+    values = (column * (args.rows // len(column) + 1))[:args.rows]
+    print(f"{len(values)} rows, {sum(len(text) for text in values) / len(values):.0f} characters on average")
+
+    baseline, expected = time_decoder(eval_rows, values, args.repeat)
+    print(f"{'eval':>12}: {baseline / len(values) * 1e6:7.2f} us/row")
+
+    for name, decode in DECODERS:
+        seconds, results = time_decoder(decode, values, args.repeat)
+        agree = sum(result == legacy for result, legacy in zip(results, expected))
+        print(f"{name:>12}: {seconds / len(values) * 1e6:7.2f} us/row  "
+              f"{baseline / seconds:5.1f}x  same result on {agree}/{len(values)} rows")
+
+if __name__ == "__main__":
+    main()
@@ -2,29 +2,78 @@
 
 import os
 import sys
+import time
+import argparse
+from typing import Dict, List, Sequence
+
 import pandas as pd
 import torch
 
 # Add src/ to path
 sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
-from src.model_utils import load_llama_model
-
-model, tokenizer = load_llama_model()
+from src.model_utils import load_model, pick_device
 
-def process_ingredient(ingredient: str) -> str:
-    prompt = f"""
+def build_prompt(ingredient: str) -> str:
+    return f"""
 Convert the following ingredient to a standardized quantity and metric equivalent.
 If density is unknown or missing, respond with NEED_SEARCH.
 
 Ingredient: {ingredient}
 """
-    inputs = tokenizer(prompt, return_tensors="pt").to("cuda")
-    outputs = model.generate(**inputs, max_new_tokens=100)
-    return tokenizer.decode(outputs[0], skip_special_tokens=True)
+
+def generate_batched(model, tokenizer, ingredients: Sequence, batch_size: int = 8,
+                     max_new_tokens: int = 100, device: str = "cpu") -> List[str]:
+    """
+    Generate a response for every ingredient, one model.generate call per batch.
+
+    Each distinct ingredient text is generated once. Prompts are sorted by
+    token length so each padded batch wastes little compute on padding, and
+    the responses are scattered back in the order of ingredients.
+    """
+    texts = [str(ingredient) for ingredient in ingredients]
+    unique = list(dict.fromkeys(texts))
+    prompts = [build_prompt(text) for text in unique]
+
+    lengths = [len(ids) for ids in tokenizer(prompts)["input_ids"]]
+    order = sorted(range(len(prompts)), key=lambda i: lengths[i], reverse=True)
+
+    # Decoder-only models continue from the right, so batches are padded on the left
+    padding_side = tokenizer.padding_side
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    responses: Dict[str, str] = {}
+    try:
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            inputs = tokenizer([prompts[i] for i in batch], return_tensors="pt", padding=True).to(device)
+            with torch.inference_mode():
+                outputs = model.generate(**inputs, max_new_tokens=max_new_tokens,
+                                         pad_token_id=tokenizer.pad_token_id)
+            for i, text in zip(batch, tokenizer.batch_decode(outputs, skip_special_tokens=True)):
+                responses[unique[i]] = text
+            print(f"[🔁] {min(start + batch_size, len(order))}/{len(order)} unique ingredients")
+    finally:
+        tokenizer.padding_side = padding_side
+
+    return [responses[text] for text in texts]
 
 def main():
-    input_csv = "data-processing/data/input/recipes.csv"
-    output_csv = "data-processing/data/output/converted_recipes.csv"
+    parser = argparse.ArgumentParser(description='Standardize recipe ingredients with a language model')
+    parser.add_argument('--input', '-i', default="data-processing/data/input/recipes.csv", help='Input CSV file path')
+    parser.add_argument('--output', '-o', default="data-processing/data/output/converted_recipes.csv",
+                        help='Output CSV file path')
+    parser.add_argument('--model', default=None,
+                        help='Hugging Face model to load with transformers, e.g. sshleifer/tiny-gpt2 '
+                             '(default: Llama 3, with Unsloth on CUDA and transformers elsewhere)')
+    parser.add_argument('--device', default=None, help='Device to run on (default: cuda, then mps, then cpu)')
+    parser.add_argument('--batch-size', '-b', type=int, default=8, help='Prompts per generate call')
+    parser.add_argument('--max-new-tokens', type=int, default=100, help='Tokens to generate per ingredient')
+    args = parser.parse_args()
+
+    input_csv = args.input
+    output_csv = args.output
 
     if not os.path.exists(input_csv):
         print(f"[❌] CSV not found at {input_csv}")
@@ -36,8 +85,20 @@ def main():
         print("[❌] 'ingredients' column missing.")
         return
 
-    print("[🔁] Processing ingredients...")
-    df['standardized_ingredients'] = df['ingredients'].apply(process_ingredient)
+    device = pick_device(args.device)
+    model, tokenizer = load_model(args.model, device)
+
+    print(f"[🔁] Processing ingredients on {device}...")
+    start = time.perf_counter()
+    df['standardized_ingredients'] = generate_batched(
+        model, tokenizer, df['ingredients'], args.batch_size, args.max_new_tokens, device
+    )
+    seconds = max(time.perf_counter() - start, 1e-9)
+    prompts = df['ingredients'].astype(str).nunique()
+    print(f"[⏱️] {len(df)} recipes ({prompts} unique ingredient lists) in {seconds:.1f}s: "
+          f"{len(df) / seconds:.2f} recipes/s, {prompts / seconds:.2f} prompts/s")
+
+    os.makedirs(os.path.dirname(output_csv) or ".", exist_ok=True)
     df.to_csv(output_csv, index=False)
     print(f"[✅] Output saved to {output_csv}")
 
@@ -1,5 +1,6 @@
 # src/__init__.py
 from .knowledge_base import KnowledgeBase
+from .sqlite_store import SQLiteKnowledgeBase
 from .web_search import WebSearchManager
 from .parser import RecipeParser
 from .converter import RecipeConverter
\ No newline at end of file
@@ -0,0 +1,123 @@
+# src/async_search.py
+
+import asyncio
+from typing import Dict, Iterable, List, Optional, Tuple, Any
+
+from .rate_limit import backoff_delay
+from .search_cache import MISSING
+from .single_flight import AsyncSingleFlight
+from .web_search import WebSearchManager
+
+class AsyncWebSearchManager:
+    """Concurrent front end for WebSearchManager.
+
+    Up to max_concurrency queries run at once in worker threads. They share
+    the WebSearchManager's token bucket, so the overall query rate is the same
+    as for sequential searches, but cache hits and result extraction never wait
+    behind a fixed sleep. Concurrent lookups for the same cache key share one
+    search. Checking the cache, extracting results and storing them are left
+    to the WebSearchManager, so both managers handle lookups the same way.
+    """
+
+    def __init__(self, web_search: WebSearchManager, max_concurrency: int = 4):
+        self.web_search = web_search
+        self.knowledge_base = web_search.knowledge_base
+        self.max_concurrency = max_concurrency
+        self._flights = AsyncSingleFlight()
+
+        # One event loop for the whole run, created by the first run() call
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Bounds the searches in flight across every caller, created on the loop that uses it
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def run(self, coroutine):
+        """Run a coroutine to completion on this manager's event loop and return its result."""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coroutine)
+
+    def close(self):
+        """Stop the worker threads of the event loop and close it."""
+        if self._loop is not None:
+            self._loop.run_until_complete(self._loop.shutdown_default_executor())
+            self._loop.close()
+            self._loop = None
+
+    def _limit(self) -> asyncio.Semaphore:
+        """The semaphore allowing max_concurrency searches at once, for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def search(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """Search with rate limiting and jittered exponential backoff. Returns None if every attempt failed."""
+        for attempt in range(self.web_search.max_retries):
+            async with self._limit():
+                await self.web_search.rate_limiter.acquire_async()
+                try:
+                    return await asyncio.to_thread(self.web_search.search_once, query)
+                except Exception as e:
+                    print(f"Search attempt {attempt+1} failed: {e}")
+            await asyncio.sleep(backoff_delay(attempt, self.web_search.delay))
+
+        return None
+
+    async def search_ingredient_density(self, ingredient: str) -> Optional[float]:
+        """Search for ingredient density online."""
+        cache_key = self.web_search.density_cache_key(ingredient)
+        cached = self.web_search.cached_result(cache_key)
+        if cached is not MISSING:
+            return cached
+
+        return await self._flights.do(cache_key, self._search_density, ingredient)
+
+    async def _search_density(self, ingredient: str) -> Optional[float]:
+        # A search for this ingredient may have finished since the caller checked the cache
+        cached = self.web_search.cached_result(self.web_search.density_cache_key(ingredient), recheck=True)
+        if cached is not MISSING:
+            return cached
+
+        results = await self.search(self.web_search.density_query(ingredient))
+        # Extraction may fetch pages, so it runs off the event loop
+        return await asyncio.to_thread(self.web_search.density_from_results, ingredient, results)
+
+    async def search_ingredient_quantity(self, recipe_name: str, ingredient: str) -> Optional[str]:
+        """Search for standard quantity of an ingredient in a recipe."""
+        cache_key = self.web_search.quantity_cache_key(recipe_name, ingredient)
+        cached = self.web_search.cached_result(cache_key)
+        if cached is not MISSING:
+            return cached
+
+        return await self._flights.do(cache_key, self._search_quantity, recipe_name, ingredient)
+
+    async def _search_quantity(self, recipe_name: str, ingredient: str) -> Optional[str]:
+        # A search for this lookup may have finished since the caller checked the cache
+        cached = self.web_search.cached_result(self.web_search.quantity_cache_key(recipe_name, ingredient),
+                                               recheck=True)
+        if cached is not MISSING:
+            return cached
+
+        results = await self.search(self.web_search.quantity_query(recipe_name, ingredient))
+        # Extraction may fetch pages, so it runs off the event loop
+        return await asyncio.to_thread(self.web_search.quantity_from_results, recipe_name, ingredient, results)
+
+    async def resolve_densities(self, ingredients: Iterable[str]) -> Dict[str, Optional[float]]:
+        """Look up the densities of many ingredients concurrently."""
+        ingredients = list(dict.fromkeys(ingredients))
+        densities = await asyncio.gather(
+            *(self.search_ingredient_density(ingredient) for ingredient in ingredients)
+        )
+        return dict(zip(ingredients, densities))
+
+    async def resolve_quantities(self, lookups: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+        """Look up many (recipe name, ingredient) quantities concurrently."""
+        lookups = list(dict.fromkeys(lookups))
+        quantities = await asyncio.gather(
+            *(self.search_ingredient_quantity(recipe_name, ingredient)
+              for recipe_name, ingredient in lookups)
+        )
+        return dict(zip(lookups, quantities))
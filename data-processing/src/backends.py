@@ -0,0 +1,221 @@
+# src/backends.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+class FetchedPage:
+    """Status, body and cache validators of a fetched page."""
+
+    __slots__ = ("status", "body", "encoding", "etag", "last_modified")
+
+    def __init__(self, status: int, body: bytes = b'', encoding: Optional[str] = None,
+                 etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.status = status
+        self.body = body
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def text(self) -> str:
+        return self.body.decode(self.encoding or 'utf-8', errors='replace')
+
+class FixtureMissing(LookupError):
+    """A replayed query has no recorded results."""
+
+class LiveBackend:
+    """Searches DuckDuckGo and fetches pages over pooled HTTP connections.
+
+    Connections are kept alive and limited to max_connections_per_host per
+    host. At most max_page_bytes of a page body are read.
+    """
+
+    def __init__(self, max_results: int = 5, pool_size: int = 10, max_connections_per_host: int = 2,
+                 max_page_bytes: int = 2 * 1024 * 1024, fetch_timeout: float = 10):
+        self.max_results = max_results
+        self.max_page_bytes = max_page_bytes
+        self.fetch_timeout = fetch_timeout
+        self._local = threading.local()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=max_connections_per_host,
+            pool_block=True,
+            max_retries=0
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        """Run a single search query. Safe to call from several threads at once."""
+        ddgs = getattr(self._local, "ddgs", None)
+        if ddgs is None:
+            # Imported here so replays work without the search client installed
+            from duckduckgo_search import DDGS
+            ddgs = self._local.ddgs = DDGS()
+        return list(ddgs.text(query, max_results=self.max_results))
+
+    def fetch(self, url: str, headers: Optional[Dict[str, str]] = None,
+              cancelled: Optional[threading.Event] = None) -> Optional[FetchedPage]:
+        """Fetch a page. Only 200 responses have a body.
+
+        Returns None on errors or if cancelled is set while the body is streaming.
+        """
+        try:
+            with self.session.get(url, timeout=self.fetch_timeout, stream=True, headers=headers) as response:
+                chunks = []
+                size = 0
+                if response.status_code == 200:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        if cancelled is not None and cancelled.is_set():
+                            return None
+                        chunks.append(chunk)
+                        size += len(chunk)
+                        if size >= self.max_page_bytes:
+                            break
+
+                return FetchedPage(
+                    response.status_code,
+                    b''.join(chunks)[:self.max_page_bytes],
+                    response.encoding,
+                    response.headers.get('ETag'),
+                    response.headers.get('Last-Modified')
+                )
+        except Exception:
+            return None
+
+    def close(self):
+        self.session.close()
+
+class _FixtureStore:
+    """Search results and page bodies on disk, one file per query or URL."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.searches_path = self.path / "searches"
+        self.pages_path = self.path / "pages"
+
+    @staticmethod
+    def _digest(key: str) -> str:
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _write(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def save_search(self, query: str, results: List[Dict[str, Any]]):
+        data = json.dumps({"query": query, "results": results}, indent=2).encode('utf-8')
+        self._write(self.searches_path / (self._digest(query) + ".json"), data)
+
+    def load_search(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        path = self.searches_path / (self._digest(query) + ".json")
+        if not path.exists():
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)["results"]
+
+    def save_page(self, url: str, page: Optional[FetchedPage]):
+        """Record a fetched page; None records a failed fetch."""
+        digest = self._digest(url)
+        meta = {"url": url, "status": None}
+        if page is not None:
+            meta.update(status=page.status, encoding=page.encoding,
+                        etag=page.etag, last_modified=page.last_modified)
+            self._write(self.pages_path / (digest + ".body"), page.body)
+        self._write(self.pages_path / (digest + ".json"), json.dumps(meta, indent=2).encode('utf-8'))
+
+    def load_page(self, url: str) -> Optional[FetchedPage]:
+        digest = self._digest(url)
+        meta_path = self.pages_path / (digest + ".json")
+        if not meta_path.exists():
+            return None
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta["status"] is None:
+            return None
+
+        body_path = self.pages_path / (digest + ".body")
+        body = body_path.read_bytes() if body_path.exists() else b''
+        return FetchedPage(meta["status"], body, meta.get("encoding"), meta.get("etag"), meta.get("last_modified"))
+
+class RecordBackend:
+    """Passes calls to another backend and stores every result as a fixture.
+
+    Pages are always fetched unconditionally, so the fixtures hold full
+    bodies rather than 304 responses.
+    """
+
+    def __init__(self, backend, path="data/fixtures"):
+        self.backend = backend
+        self.store = _FixtureStore(path)
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        results = self.backend.search(query)
+        self.store.save_search(query, results)
+        return results
+
+    def fetch(self, url: str, headers: Optional[Dict[str, str]] = None,
+              cancelled: Optional[threading.Event] = None) -> Optional[FetchedPage]:
+        page = self.backend.fetch(url, None, cancelled)
+        if page is None and cancelled is not None and cancelled.is_set():
+            # Not a real outcome, so don't record it
+            return None
+        self.store.save_page(url, page)
+        return page
+
+    def close(self):
+        self.backend.close()
+
+class ReplayBackend:
+    """Serves recorded fixtures without touching the network.
+
+    search_latency and fetch_latency add a fixed delay to every call, so
+    replays can stand in for the network when measuring throughput. Queries
+    that were never recorded raise FixtureMissing and are treated like failed
+    searches; unrecorded pages are treated like failed fetches.
+    """
+
+    def __init__(self, path="data/fixtures", search_latency: float = 0.0, fetch_latency: float = 0.0):
+        self.store = _FixtureStore(path)
+        self.search_latency = search_latency
+        self.fetch_latency = fetch_latency
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        if self.search_latency:
+            time.sleep(self.search_latency)
+        results = self.store.load_search(query)
+        if results is None:
+            raise FixtureMissing(f"No recorded results for {query!r}")
+        return results
+
+    def fetch(self, url: str, headers: Optional[Dict[str, str]] = None,
+              cancelled: Optional[threading.Event] = None) -> Optional[FetchedPage]:
+        if self.fetch_latency:
+            time.sleep(self.fetch_latency)
+        if cancelled is not None and cancelled.is_set():
+            return None
+        return self.store.load_page(url)
+
+    def close(self):
+        pass
+
+def create_backend(mode: str = "live", fixtures="data/fixtures", latency: float = 0.0, **live_options):
+    """Search backend for a mode: live, record (live plus fixtures) or replay."""
+    if mode == "replay":
+        return ReplayBackend(fixtures, latency, latency)
+    if mode == "record":
+        return RecordBackend(LiveBackend(**live_options), fixtures)
+    if mode == "live":
+        return LiveBackend(**live_options)
+    raise ValueError(f"Unknown search mode {mode!r}")
@@ -0,0 +1,111 @@
+# src/checkpoint.py
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from .records import RECORDS_COLUMN
+
+class CheckpointedOutput:
+    """CSV output that records how far a conversion run got, so it can be resumed.
+
+    Rows are appended to the output and flushed to disk. checkpoint() then
+    records the number of input rows completed and the output size in a
+    JSON file next to the output. Callers save the knowledge base between
+    append() and checkpoint(), so a checkpoint never points past state that
+    was lost. Resuming truncates anything written after the last checkpoint
+    and returns the number of input rows to skip.
+
+    settings are the run options that shape the output (e.g. the columns
+    kept or the knowledge base storage). They and the output's columns are
+    stored in the checkpoint, and a run with different ones can't resume it,
+    since its rows wouldn't match the rows already written.
+    """
+
+    def __init__(self, output_file: str, input_file: str, settings: Optional[Dict[str, Any]] = None):
+        self.output_path = Path(output_file)
+        self.checkpoint_path = Path(str(output_file) + ".checkpoint.json")
+        self.input_file = str(input_file)
+        self.settings = settings or {}
+        self.columns: Optional[List[str]] = None
+        self.rows = 0
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """The last checkpoint, or None if there is none."""
+        if not self.checkpoint_path.exists():
+            return None
+        with open(self.checkpoint_path, 'r') as f:
+            return json.load(f)
+
+    def open(self, resume: bool = False) -> Optional[int]:
+        """Prepare the output and return the number of input rows already converted.
+
+        Without resume, or without a checkpoint to resume from, the output is
+        started afresh. Returns None if the checkpoint can't be resumed.
+        """
+        state = self.load() if resume else None
+        if state is None:
+            if resume:
+                print(f"No checkpoint at {self.checkpoint_path}, starting from the beginning.")
+            self.output_path.write_bytes(b'')
+            self._write(complete=False, offset=0)
+            return 0
+
+        if state["input"] != self.input_file:
+            print(f"Checkpoint is for {state['input']}, not {self.input_file}.")
+            return None
+        settings = state.get("settings", {})
+        if settings != self.settings:
+            changed = sorted(key for key in set(settings) | set(self.settings)
+                             if settings.get(key) != self.settings.get(key))
+            print(f"Checkpoint was written with different settings ({', '.join(changed)}): {settings}")
+            return None
+        if not self.output_path.exists() or self.output_path.stat().st_size < state["offset"]:
+            print(f"Output {self.output_path} is shorter than its checkpoint.")
+            return None
+
+        # Rows written after the checkpoint are converted again
+        os.truncate(self.output_path, state["offset"])
+        self.rows = state["rows"]
+        self.columns = state.get("columns")
+        if state["complete"]:
+            print(f"Run already complete ({self.rows} rows).")
+        else:
+            print(f"Resuming after {self.rows} rows.")
+        return self.rows
+
+    def append(self, df: pd.DataFrame):
+        """Append converted rows to the output and flush them to disk.
+
+        The structured records column is left out; CSV keeps the ingredient
+        lists as JSON strings only.
+        """
+        df = df.drop(columns=RECORDS_COLUMN, errors='ignore')
+        columns = [str(column) for column in df.columns]
+        if self.columns is None:
+            self.columns = columns
+        elif columns != self.columns:
+            raise ValueError(f"Rows with columns {columns} don't match the output's columns {self.columns}")
+
+        with open(self.output_path, 'a', newline='') as f:
+            df.to_csv(
+                f, index=False, header=self.output_path.stat().st_size == 0)
+            f.flush()
+            os.fsync(f.fileno())
+        self.rows += len(df)
+
+    def checkpoint(self, complete: bool = False):
+        """Record that every row appended so far is done."""
+        self._write(complete, self.output_path.stat().st_size)
+
+    def _write(self, complete: bool, offset: int):
+        tmp_path = self.checkpoint_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({"input": self.input_file, "rows": self.rows, "offset": offset, "complete": complete,
+                       "columns": self.columns, "settings": self.settings}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
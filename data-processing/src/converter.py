@@ -1,30 +1,50 @@
 # src/converter.py
 
+import json
 import re
-from typing import Dict, List, Tuple, Optional
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Tuple, Optional, Union, Iterator, Sequence, Set
 from .knowledge_base import KnowledgeBase
 from .web_search import WebSearchManager
+from .parser import RecipeParser
+from .units import UNITS, UNIT_VOLUME, QUANTITY
+from .records import IngredientRecord, RECORDS_COLUMN, SOURCE_RECIPE, SOURCE_STEPS, SOURCE_WEB, SOURCE_MISSING
+from .search_cache import SearchCache, MISSING
+from .vocabulary import Vocabulary
+
+# Kinds of deferred web lookups
+LOOKUP_QUANTITY = "quantity"
+LOOKUP_DENSITY = "density"
 
 class RecipeConverter:
-    def __init__(self, knowledge_base: KnowledgeBase, web_search: WebSearchManager):
+    def __init__(self, knowledge_base: KnowledgeBase, web_search: WebSearchManager, memo_size: int = 50000):
         self.knowledge_base = knowledge_base
         self.web_search = web_search
         
+        # Parsed and converted results for ingredient strings that carry their own
+        # quantity, keyed by normalized text. Negative entries mark strings without one.
+        # Entries only depend on the text, the interned IDs and the unit factors,
+        # none of which change during a run, so they never go stale.
+        self._memo = SearchCache(max_entries=memo_size, ttl=None, negative_ttl=None)
+        
+        # While set, web lookups are answered from the cache only and misses are
+        # collected here as ("quantity", recipe_name, ingredient) or ("density", ingredient)
+        self.deferred: Optional[Set[Tuple[str, ...]]] = None
+        
         # Pattern for extracting quantity and unit from ingredient string
-        self.quantity_pattern = re.compile(
-            r'^(\d+(?:\.\d+)?(?:\s+\d+/\d+)?|\d+/\d+)\s*(' + 
-            '|'.join(knowledge_base.conversions["volume_units"] + 
-                    knowledge_base.conversions["weight_units"] + 
-                    knowledge_base.conversions["count_units"]) + 
-            r')?\s+(?:of\s+)?(.+)$',
-            re.IGNORECASE
-        )
+        self.quantity_pattern = UNITS.quantity_pattern
+        
+        # Parser for mining quantities from recipe steps
+        self.parser = RecipeParser()
+        
+        # Pattern for splitting a quantity mined from the steps into number and unit
+        self.step_quantity_pattern = re.compile(r'^' + QUANTITY + r'\s*(.*)$')
         
         # Pattern for fractions
         self.fraction_pattern = re.compile(r'(\d+)/(\d+)')
     
-    def generate_standard_ingredient_list(self, recipe: Dict) -> List[str]:
-        """Generate a standardized list of ingredients with quantities."""
+    def build_ingredient_records(self, recipe: Dict) -> List[IngredientRecord]:
+        """Parse a recipe's ingredients once into structured records with quantities."""
         recipe_name = recipe['name']
         ingredients = recipe['ingredients_list']
         steps = recipe['steps']
@@ -35,83 +55,318 @@ class RecipeConverter:
             if isinstance(steps, str):
                 steps = [steps]
             if isinstance(steps, list):
-                from .parser import RecipeParser
-                parser = RecipeParser()
-                quantities_from_steps = parser.extract_quantities_from_steps(recipe_name, ingredients, steps)
+                quantities_from_steps = self.parser.extract_quantities_from_steps(recipe_name, ingredients, steps)
         
-        standard_ingredients = []
+        records = []
         
         for ingredient in ingredients:
             # Check if ingredient already has quantity
-            quantity_match = self.quantity_pattern.match(ingredient)
+            record = self._recipe_record(ingredient)
             
-            if quantity_match:
+            if record is not None:
                 # Ingredient already has quantity
-                quantity, unit, ingredient_name = quantity_match.groups()
-                standardized = f"{quantity} {unit} {ingredient_name}".strip()
-                standard_ingredients.append(standardized)
+                records.append(record)
+            elif ingredient in quantities_from_steps:
+                # Quantity was found in steps, e.g. "2 cups" or "2"
+                quantity, unit = self.step_quantity_pattern.match(quantities_from_steps[ingredient]).groups()
+                records.append(self._make_record(quantity, unit or None, ingredient, SOURCE_STEPS))
             else:
-                # Check if quantity was found in steps
-                if ingredient in quantities_from_steps:
-                    quantity = quantities_from_steps[ingredient]
-                    standard_ingredients.append(f"{quantity} {ingredient}")
-                else:
-                    # Search for quantity online
-                    quantity = self.web_search.search_ingredient_quantity(recipe_name, ingredient)
-                    if quantity:
-                        standard_ingredients.append(f"{quantity}")
-                    else:
-                        # No quantity found, add as is (to taste)
-                        standard_ingredients.append(f"{ingredient} to taste")
-        
-        return standard_ingredients
-    
-    def generate_metric_ingredient_list(self, standard_ingredients: List[str]) -> List[str]:
-        """Convert standard ingredients to metric."""
-        metric_ingredients = []
-        
-        for ingredient_str in standard_ingredients:
-            # Parse ingredient string
-            parts = self._parse_ingredient_string(ingredient_str)
-            
-            if not parts:
-                # Could not parse, keep as is
-                metric_ingredients.append(ingredient_str)
-                continue
-                
-            quantity, unit, ingredient_name = parts
-            
-            # Skip if no quantity or unit
-            if not quantity or not unit:
-                metric_ingredients.append(ingredient_str)
+                # Search for quantity online
+                records.append(self._search_record(recipe_name, ingredient))
+        
+        return records
+    
+    def _recipe_record(self, ingredient: str) -> Optional[IngredientRecord]:
+        """Parse and convert an ingredient that carries its own quantity, using the memo.
+        
+        Returns None if the ingredient text has no leading quantity.
+        """
+        key = Vocabulary.normalize(ingredient)
+        cached = self._memo.get(key, MISSING)
+        
+        if cached is None:
+            return None
+        if cached is not MISSING:
+            quantity, quantity_text, unit_id, ingredient_id, metric_quantity, metric_unit = cached
+            record = IngredientRecord(quantity, unit_id, ingredient_id, SOURCE_RECIPE, quantity_text=quantity_text)
+            record.metric_quantity = metric_quantity
+            record.metric_unit = metric_unit
+            return record
+        
+        quantity_match = self.quantity_pattern.match(ingredient)
+        if not quantity_match:
+            self._memo.set(key, None, negative=True)
+            return None
+        
+        quantity, unit, ingredient_name = quantity_match.groups()
+        record = self._make_record(quantity, unit, ingredient_name, SOURCE_RECIPE)
+        self.convert_records([record])
+        self._memo.set(key, (record.quantity, record.quantity_text, record.unit_id, record.ingredient_id,
+                             record.metric_quantity, record.metric_unit))
+        return record
+    
+    def memo_stats(self) -> Dict:
+        """Hit, miss and eviction counters for the ingredient memo."""
+        return self._memo.stats()
+    
+    def _make_record(self, quantity: Optional[str], unit: Optional[str], ingredient_name: str,
+                     source: str, text: Optional[str] = None) -> IngredientRecord:
+        """Create a record, interning the unit and ingredient name."""
+        return IngredientRecord(
+            self._convert_to_float(quantity) if quantity is not None else None,
+            self.knowledge_base.unit_code(unit) if unit else None,
+            self.knowledge_base.ingredient_id(ingredient_name),
+            source,
+            quantity_text=quantity,
+            text=text
+        )
+    
+    def _search_record(self, recipe_name: str, ingredient: str) -> IngredientRecord:
+        """Build a record for an ingredient whose quantity has to be searched for online."""
+        quantity = self._lookup_quantity(recipe_name, ingredient)
+        if not quantity:
+            # No quantity found, keep the ingredient as is (to taste)
+            return self._make_record(None, None, ingredient, SOURCE_MISSING)
+        
+        quantity_match = self.quantity_pattern.match(quantity.strip())
+        if quantity_match:
+            quantity, unit, ingredient_name = quantity_match.groups()
+            return self._make_record(quantity, unit, ingredient_name, SOURCE_WEB)
+        
+        # Keep a result we can't parse verbatim
+        return self._make_record(None, None, ingredient, SOURCE_WEB, text=quantity)
+    
+    def convert_records(self, records: List[IngredientRecord]) -> List[IngredientRecord]:
+        """Fill in the metric quantity and unit of every record that has a quantity."""
+        for record in records:
+            # Skip records without a quantity and records that are already converted
+            if record.quantity is None or record.metric_quantity is not None:
                 continue
             
-            # Convert quantity to float
-            quantity_float = self._convert_to_float(quantity)
+            # Ingredients without a unit are counted in pieces
+            unit_id = record.unit_id
+            if unit_id is None:
+                unit_id = self.knowledge_base.unit_code("piece")
             
             # Get density if needed
-            if unit in self.knowledge_base.conversions["volume_units"]:
-                density = self.knowledge_base.get_density(ingredient_name)
+            if self.knowledge_base.unit_kind(unit_id) == UNIT_VOLUME:
+                density = self.knowledge_base.get_density_by_id(record.ingredient_id)
                 if not density:
                     # Search for density online
-                    density = self.web_search.search_ingredient_density(ingredient_name)
+                    density = self._lookup_density(self._name(record))
             
             # Convert to metric
-            metric_quantity, metric_unit = self.knowledge_base.convert_to_metric(
-                quantity_float, unit, ingredient_name
+            record.metric_quantity, record.metric_unit = self.knowledge_base.convert_code(
+                record.quantity, unit_id
             )
+        
+        return records
+    
+    def _lookup_quantity(self, recipe_name: str, ingredient: str) -> Optional[str]:
+        """Search for a quantity online, or only consult the cache while lookups are deferred."""
+        if self.deferred is None:
+            return self.web_search.search_ingredient_quantity(recipe_name, ingredient)
+        
+        cached = self.web_search.cached_result(self.web_search.quantity_cache_key(recipe_name, ingredient))
+        if cached is MISSING:
+            self.deferred.add((LOOKUP_QUANTITY, recipe_name, ingredient))
+            return None
+        return cached
+    
+    def _lookup_density(self, ingredient: str) -> Optional[float]:
+        """Search for a density online, or only consult the cache while lookups are deferred."""
+        if self.deferred is None:
+            return self.web_search.search_ingredient_density(ingredient)
+        
+        cached = self.web_search.cached_result(self.web_search.density_cache_key(ingredient))
+        if cached is MISSING:
+            self.deferred.add((LOOKUP_DENSITY, ingredient))
+            return None
+        return cached
+    
+    @contextmanager
+    def deferred_lookups(self) -> Iterator[Set[Tuple[str, ...]]]:
+        """Collect web lookups instead of performing them for the duration of the block."""
+        previous = self.deferred
+        self.deferred = set()
+        try:
+            yield self.deferred
+        finally:
+            self.deferred = previous
+    
+    async def prefetch_batch(self, recipes: Sequence[Union[Dict, Exception]],
+                             async_search) -> List[Union[List[IngredientRecord], Exception]]:
+        """Build and convert the records of a batch of recipes, running their web lookups concurrently.
+        
+        Records are built once with lookups deferred. The missed quantities
+        are then searched concurrently and filled in, followed by the densities.
+        Returns the records of each recipe (or the exception it failed with),
+        for convert_batch. async_search is an AsyncWebSearchManager sharing
+        this converter's web search.
+        """
+        batch: List[Union[List[IngredientRecord], Exception]] = []
+        with self.deferred_lookups() as lookups:
+            for recipe in recipes:
+                try:
+                    if isinstance(recipe, Exception):
+                        raise recipe
+                    batch.append(self.build_ingredient_records(recipe))
+                except Exception as e:
+                    batch.append(e)
+        
+        await async_search.resolve_quantities(
+            lookup[1:] for lookup in lookups if lookup[0] == LOOKUP_QUANTITY
+        )
+        
+        # Fill in the quantities found online; they can add volume measurements that need a density.
+        # Only the cache is consulted: lookups whose search failed stay missing rather than being
+        # searched again one by one.
+        with self.deferred_lookups():
+            for position, (recipe, records) in enumerate(zip(recipes, batch)):
+                if isinstance(records, Exception):
+                    continue
+                try:
+                    for i, record in enumerate(records):
+                        if record.source == SOURCE_MISSING:
+                            records[i] = self._search_record(recipe['name'], recipe['ingredients_list'][i])
+                except Exception as e:
+                    batch[position] = e
+        
+        with self.deferred_lookups() as density_lookups:
+            density_lookups.update(lookup for lookup in lookups if lookup[0] == LOOKUP_DENSITY)
+            for position, records in enumerate(batch):
+                if isinstance(records, Exception):
+                    continue
+                try:
+                    self.convert_records(records)
+                except Exception as e:
+                    batch[position] = e
+        
+        await async_search.resolve_densities(
+            lookup[1] for lookup in density_lookups if lookup[0] == LOOKUP_DENSITY
+        )
+        return batch
+    
+    async def resolve_lookups(self, lookups: Iterable[Tuple[str, ...]], async_search) -> None:
+        """Run collected web lookups concurrently, quantities before densities."""
+        lookups = list(lookups)
+        await async_search.resolve_quantities(
+            lookup[1:] for lookup in lookups if lookup[0] == LOOKUP_QUANTITY
+        )
+        await async_search.resolve_densities(
+            lookup[1] for lookup in lookups if lookup[0] == LOOKUP_DENSITY
+        )
+    
+    def render_standard(self, record: IngredientRecord) -> str:
+        """Render a record as a standard ingredient string."""
+        if record.text is not None:
+            return record.text
+        if record.quantity is None:
+            return f"{self._name(record)} to taste"
+        if record.unit_id is None:
+            return f"{record.quantity_text} {self._name(record)}"
+        return f"{record.quantity_text} {self.knowledge_base.unit_vocab.name(record.unit_id)} {self._name(record)}"
+    
+    def render_metric(self, record: IngredientRecord) -> str:
+        """Render a converted record as a metric ingredient string."""
+        if record.metric_quantity is None:
+            return self.render_standard(record)
+        
+        # Format metric quantity
+        metric_quantity = record.metric_quantity
+        if metric_quantity == int(metric_quantity):
+            metric_quantity = int(metric_quantity)
+        else:
+            metric_quantity = round(metric_quantity, 1)
+        
+        return f"{metric_quantity} {record.metric_unit} {self._name(record)}"
+    
+    def convert_recipe(self, recipe: Dict) -> Tuple[str, str, List[Dict[str, Any]]]:
+        """Standard and metric ingredient lists of a parsed recipe as JSON strings, and its converted records."""
+        # Parse ingredients once into records and convert them to metric
+        return self.render_records(self.convert_records(self.build_ingredient_records(recipe)))
+    
+    def render_records(self, records: List[IngredientRecord]) -> Tuple[str, str, List[Dict[str, Any]]]:
+        """Standard and metric ingredient lists of converted records as JSON strings, and the records as fields."""
+        standard_ingredients_str = json.dumps([self.render_standard(record) for record in records])
+        metric_ingredients_str = json.dumps([self.render_metric(record) for record in records])
+        return standard_ingredients_str, metric_ingredients_str, [self.record_fields(record) for record in records]
+    
+    def convert_batch(self, recipes: Sequence[Union[Dict, Exception]], index: Optional[Sequence] = None,
+                      records: Optional[Sequence[Union[List[IngredientRecord], Exception]]] = None) -> Dict[str, List]:
+        """Convert a batch of parsed recipes into result columns.
+        
+        Returns standard_ingredients, metric_ingredients and ingredient_records
+        columns in the order of recipes. Recipes that are exceptions (parse
+        failures) or fail to convert get empty lists; index labels the rows in
+        error messages. records, as returned by prefetch_batch, are rendered
+        instead of converting the recipes again.
+        """
+        index = range(len(recipes)) if index is None else index
+        columns = {'standard_ingredients': [], 'metric_ingredients': [], RECORDS_COLUMN: []}
+        
+        for position, (idx, recipe) in enumerate(zip(index, recipes)):
+            try:
+                # Prefetched records carry the parse or conversion error of their recipe
+                item = recipe if records is None else records[position]
+                if isinstance(item, Exception):
+                    raise item
+                if records is None:
+                    standard_ingredients_str, metric_ingredients_str, fields = self.convert_recipe(item)
+                else:
+                    standard_ingredients_str, metric_ingredients_str, fields = self.render_records(item)
+            except Exception as e:
+                print(f"Error processing recipe at index {idx}: {e}")
+                # Set to empty lists for failed processing
+                standard_ingredients_str, metric_ingredients_str, fields = "[]", "[]", []
             
-            # Format metric quantity
-            if metric_quantity == int(metric_quantity):
-                metric_quantity = int(metric_quantity)
-            else:
-                metric_quantity = round(metric_quantity, 1)
-            
-            # Create metric ingredient string
-            metric_ingredient = f"{metric_quantity} {metric_unit} {ingredient_name}"
-            metric_ingredients.append(metric_ingredient)
+            columns['standard_ingredients'].append(standard_ingredients_str)
+            columns['metric_ingredients'].append(metric_ingredients_str)
+            columns[RECORDS_COLUMN].append(fields)
+        
+        return columns
+    
+    def record_fields(self, record: IngredientRecord) -> Dict[str, Any]:
+        """A converted record as plain fields, with its unit and ingredient as names."""
+        return {
+            "quantity": record.quantity,
+            "quantity_text": record.quantity_text,
+            "unit": None if record.unit_id is None else self.knowledge_base.unit_vocab.name(record.unit_id),
+            "name": self._name(record),
+            "metric_quantity": record.metric_quantity,
+            "metric_unit": record.metric_unit,
+            "source": record.source,
+            "text": record.text
+        }
+    
+    def _name(self, record: IngredientRecord) -> str:
+        """Canonical ingredient name of a record."""
+        return self.knowledge_base.ingredient_vocab.name(record.ingredient_id)
+    
+    def generate_standard_ingredient_list(self, recipe: Dict) -> List[str]:
+        """Generate a standardized list of ingredients with quantities."""
+        return [self.render_standard(record) for record in self.build_ingredient_records(recipe)]
+    
+    def generate_metric_ingredient_list(self, standard_ingredients: List[Union[str, IngredientRecord]]) -> List[str]:
+        """Convert standard ingredients to metric.
+        
+        Accepts records from build_ingredient_records, or standard ingredient
+        strings, which are parsed first.
+        """
+        records = [
+            item if isinstance(item, IngredientRecord) else self._parse_standard_string(item)
+            for item in standard_ingredients
+        ]
+        return [self.render_metric(record) for record in self.convert_records(records)]
+    
+    def _parse_standard_string(self, ingredient_str: str) -> IngredientRecord:
+        """Parse a standard ingredient string into a record."""
+        quantity, unit, ingredient_name = self._parse_ingredient_string(ingredient_str)
         
-        return metric_ingredients
+        if not quantity or not unit:
+            # Nothing to convert, keep the string as is
+            return self._make_record(None, None, ingredient_name, SOURCE_RECIPE, text=ingredient_str)
+        return self._make_record(quantity, unit, ingredient_name, SOURCE_RECIPE)
     
     def _parse_ingredient_string(self, ingredient_str: str) -> Optional[Tuple[str, str, str]]:
         """Parse ingredient string into quantity, unit, and name."""
@@ -0,0 +1,87 @@
+# src/density_index.py
+
+from typing import Dict, Iterable, Optional, Set
+
+# Marker for the end of a key inside the trie (node keys are otherwise single characters)
+_END = ""
+
+class DensityIndex:
+    """Substring index over density keys with deterministic longest-match lookups.
+
+    Keys contained in a query are found by walking a character trie from every
+    position of the query, so the cost depends on the query length rather than
+    on the number of keys. Keys containing a query are found by intersecting
+    n-gram posting lists. Both structures are updated incrementally by add().
+    """
+
+    def __init__(self, keys: Iterable[str] = (), gram_size: int = 3):
+        self.gram_size = gram_size
+        self._trie: Dict = {}
+        self._postings: Dict[str, Set[str]] = {}
+
+        for key in keys:
+            self.add(key)
+
+    def add(self, key: str):
+        """Index a key. Adding a key twice is a no-op."""
+        if not key:
+            return
+
+        node = self._trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[_END] = key
+
+        for gram in self._grams(key, include_short=True):
+            self._postings.setdefault(gram, set()).add(key)
+
+    def lookup(self, text: str) -> Optional[str]:
+        """Find the best key for a text: the longest key it contains, else the shortest key containing it."""
+        return self.longest_contained(text) or self.shortest_containing(text)
+
+    def longest_contained(self, text: str) -> Optional[str]:
+        """Return the longest key that occurs in text (ties broken alphabetically)."""
+        best = None
+
+        for start in range(len(text)):
+            node = self._trie
+            for char in text[start:]:
+                node = node.get(char)
+                if node is None:
+                    break
+                key = node.get(_END)
+                if key is not None and (best is None or (-len(key), key) < (-len(best), best)):
+                    best = key
+
+        return best
+
+    def shortest_containing(self, text: str) -> Optional[str]:
+        """Return the shortest key that contains text (ties broken alphabetically)."""
+        if not text:
+            return None
+
+        postings = [self._postings.get(gram) for gram in self._grams(text)]
+        if not postings or any(posting is None for posting in postings):
+            return None
+
+        # Intersect starting from the rarest gram, then confirm the real substring
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return None
+
+        matches = [key for key in candidates if text in key]
+        if not matches:
+            return None
+        return min(matches, key=lambda key: (len(key), key))
+
+    def _grams(self, text: str, include_short: bool = False) -> Set[str]:
+        """Split text into overlapping n-grams.
+
+        Texts shorter than gram_size are their own single gram. When indexing keys,
+        every shorter gram is recorded as well so that short queries can be answered.
+        """
+        sizes = range(1, self.gram_size + 1) if include_short else [min(self.gram_size, len(text))]
+        return {text[i:i + size] for size in sizes for i in range(len(text) - size + 1)}
@@ -0,0 +1,50 @@
+# src/density_pack.py
+
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Bumped when the pack layout changes incompatibly
+PACK_FORMAT = 1
+
+def pack_version() -> str:
+    """Default pack version: the current UTC time, which sorts chronologically."""
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+def write_density_pack(directory, densities: Dict[str, float], version: Optional[str] = None,
+                       metadata: Optional[Dict[str, Any]] = None) -> Path:
+    """Write densities (g/cup by normalized name) as densities-<version>.json.gz in directory."""
+    version = version or pack_version()
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"densities-{version}.json.gz"
+
+    pack = {
+        "format": PACK_FORMAT,
+        "version": version,
+        "metadata": metadata or {},
+        "densities": {name: densities[name] for name in sorted(densities)}
+    }
+    tmp_path = path.with_suffix(".tmp")
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(pack, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return path
+
+def read_density_pack(path) -> Dict[str, Any]:
+    """Read a density pack, checking that its format is supported."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        pack = json.load(f)
+    if pack.get("format") != PACK_FORMAT:
+        raise ValueError(f"Unsupported density pack format {pack.get('format')!r} in {path}")
+    return pack
+
+def find_density_packs(directory) -> List[Path]:
+    """Density packs in directory, oldest version first."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob("densities-*.json.gz"))
@@ -0,0 +1,107 @@
+# src/harvest.py
+
+import argparse
+import asyncio
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import pandas as pd
+
+from .async_search import AsyncWebSearchManager
+from .density_pack import write_density_pack
+from .knowledge_base import KnowledgeBase
+from .main import create_knowledge_base, create_web_search, iter_recipe_chunks, recipe_columns
+from .parser import RecipeParser
+from .units import UNITS
+from .vocabulary import Vocabulary
+
+def ingredient_name(ingredient: str) -> str:
+    """Normalized ingredient name without any leading quantity and unit."""
+    match = UNITS.quantity_pattern.match(ingredient.strip())
+    name = match.group(3) if match else ingredient
+    return Vocabulary.normalize(name)
+
+def count_ingredients(chunks: Iterable[pd.DataFrame], parser: RecipeParser) -> Tuple[Counter, int]:
+    """Number of recipes each normalized ingredient appears in, and the number of recipes."""
+    counts = Counter()
+    recipes = 0
+    for df in chunks:
+        recipes += len(df)
+        for recipe in parser.parse_batch(*recipe_columns(df)):
+            if isinstance(recipe, Exception):
+                continue
+            counts.update({ingredient_name(ingredient) for ingredient in recipe['ingredients_list'] if ingredient})
+    counts.pop('', None)
+    return counts, recipes
+
+def harvest_densities(knowledge_base: KnowledgeBase, async_search: AsyncWebSearchManager,
+                      counts: Counter, top: int) -> Tuple[Dict[str, float], List[str]]:
+    """Densities of the top most frequent ingredients, searching concurrently for the unknown ones.
+
+    Only densities stored under an ingredient's exact name count; a partial
+    match (water for watermelon) would otherwise be written as the
+    ingredient's own density. Category guesses that searches fall back to
+    are not stored as densities either, so those names are reported as
+    unknown. Returns the densities found and the names that are still unknown.
+    """
+    names = [name for name, _ in counts.most_common(top)]
+    unknown = [name for name in names if knowledge_base.get_exact_density(name) is None]
+
+    print(f"{len(names) - len(unknown)} of the top {len(names)} ingredients have a density; "
+          f"searching for {len(unknown)}...")
+    if unknown:
+        asyncio.run(async_search.resolve_densities(unknown))
+
+    densities = {}
+    missing = []
+    for name in names:
+        density = knowledge_base.get_exact_density(name)
+        if density is None:
+            missing.append(name)
+        else:
+            densities[name] = density
+    return densities, missing
+
+def main():
+    """Build a density pack for the most frequent ingredients of a recipe corpus."""
+    parser = argparse.ArgumentParser(description='Harvest ingredient densities into a density pack')
+    parser.add_argument('--input', '-i', required=True, help='Input CSV file path')
+    parser.add_argument('--top', '-n', type=int, default=1000, help='Number of most frequent ingredients to cover')
+    parser.add_argument('--output-dir', '-o', default=None,
+                        help='Directory to write the pack to (default: the knowledge base packs directory)')
+    parser.add_argument('--version', default=None, help='Pack version (default: current UTC time)')
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json', help='Knowledge base storage backend')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Rows of the input to read at a time')
+    parser.add_argument('--concurrency', '-c', type=int, default=4, help='Number of concurrent web searches')
+    parser.add_argument('--search-mode', choices=['live', 'record', 'replay'], default='live',
+                        help='Search live, record searches and pages as fixtures, or replay recorded fixtures offline')
+    parser.add_argument('--fixtures', default='data/fixtures', help='Fixture directory for record and replay')
+    args = parser.parse_args()
+
+    print(f"Reading recipes from {args.input}...")
+    try:
+        counts, recipes = count_ingredients(iter_recipe_chunks(args.input, args.chunk_size), RecipeParser())
+    except Exception as e:
+        print(f"Could not read file: {e}")
+        return
+    print(f"Found {len(counts)} distinct ingredients in {recipes} recipes.")
+
+    # Earlier packs count as known, so a new pack only searches for what they miss
+    knowledge_base = create_knowledge_base(args.storage)
+    web_search = create_web_search(knowledge_base, args.search_mode, args.fixtures)
+    async_search = AsyncWebSearchManager(web_search, args.concurrency)
+
+    densities, missing = harvest_densities(knowledge_base, async_search, counts, args.top)
+    knowledge_base.save()
+    web_search.close()
+
+    covered = sum(counts[name] for name in densities)
+    path = write_density_pack(
+        args.output_dir or knowledge_base.base_path / "packs", densities, args.version,
+        {"source": str(args.input), "top": args.top, "recipes": recipes, "missing": missing}
+    )
+    print(f"Wrote {len(densities)} densities to {path} "
+          f"({covered} of {sum(counts.values())} ingredient occurrences covered, {len(missing)} not found).")
+
+if __name__ == "__main__":
+    main()
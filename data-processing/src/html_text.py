@@ -0,0 +1,129 @@
+# src/html_text.py
+
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Union
+
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:  # lxml is optional
+    lxml = None
+
+# Elements whose text starts on a new line
+BLOCK_TAGS = frozenset([
+    'p', 'li', 'div', 'br', 'tr', 'td', 'th', 'table', 'ul', 'ol', 'dt', 'dd',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'section', 'article', 'header', 'footer',
+    'blockquote', 'pre', 'title'
+])
+
+# Elements whose contents are never visible text
+SKIP_TAGS = frozenset(['script', 'style', 'noscript', 'template', 'svg', 'nav'])
+
+# Marks block boundaries while text is collected; newlines in the HTML source are just spaces
+_BREAK = '\ue000'  # a private-use character, which lxml accepts in text
+_SPACES = re.compile(r'[\s\xa0]+')
+_XML_DECLARATION = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+def _candidate_lines(text: str) -> str:
+    """Split collected text into lines at block boundaries and keep the ones that could hold a measurement.
+
+    Every density and quantity pattern needs a number, so lines without a
+    digit are dropped before any pattern runs or the text is cached.
+    """
+    lines = []
+    for line in text.split(_BREAK):
+        if any(char.isdigit() for char in line):
+            line = _SPACES.sub(' ', line).strip()
+            if line:
+                lines.append(line)
+    return '\n'.join(lines)
+
+def extract_text_bs4(html: str) -> str:
+    """Candidate lines of a page using BeautifulSoup's html.parser tree."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag in soup(list(SKIP_TAGS)):
+        tag.decompose()
+    for tag in soup.find_all(list(BLOCK_TAGS)):
+        tag.insert_before(_BREAK)
+        tag.insert_after(_BREAK)
+    return _candidate_lines(soup.get_text())
+
+class _TextCollector(HTMLParser):
+    """Collects visible text while the page is parsed, without building a tree."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append(_BREAK)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.parts.append(_BREAK)
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            if self._skip_depth:
+                self._skip_depth -= 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append(_BREAK)
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+def extract_text_stream(html: str) -> str:
+    """Candidate lines of a page using the standard library's streaming HTMLParser."""
+    collector = _TextCollector()
+    collector.feed(html)
+    collector.close()
+    return _candidate_lines(''.join(collector.parts))
+
+def extract_text_lxml(html: str) -> str:
+    """Candidate lines of a page using lxml's C parser."""
+    # lxml refuses str input that declares an encoding; the text is already decoded
+    html = _XML_DECLARATION.sub('', html, count=1)
+    if not html.strip():
+        return ''
+    tree = lxml.html.fromstring(html)
+    lxml.etree.strip_elements(tree, *SKIP_TAGS, with_tail=False)
+    for element in tree.iter(*BLOCK_TAGS):
+        element.text = _BREAK + (element.text or '')
+        element.tail = _BREAK + (element.tail or '')
+    return _candidate_lines(tree.text_content())
+
+BACKENDS: Dict[str, Callable[[str], str]] = {
+    "bs4": extract_text_bs4,
+    "stream": extract_text_stream,
+}
+if lxml is not None:
+    BACKENDS["lxml"] = extract_text_lxml
+
+# The fastest backend that is installed
+DEFAULT_BACKEND = "lxml" if "lxml" in BACKENDS else "stream"
+
+def get_extractor(backend: Union[str, Callable[[str], str], None] = None) -> Callable[[str], str]:
+    """Text extraction function for a backend name, or the backend itself if it is callable."""
+    if callable(backend):
+        return backend
+    name = backend or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown HTML backend {name!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]
+
+def extract_text(html: str, backend: Optional[str] = None) -> str:
+    """Visible text of an HTML page, one line per block element.
+
+    Script, style and navigation contents are dropped and only lines that
+    contain a digit are kept. Inline markup is joined without a separator, so
+    "1 <b>cup</b> flour" stays on one line.
+    """
+    return get_extractor(backend)(html)
@@ -3,74 +3,288 @@
 import json
 import os
 import re
+import threading
 from pathlib import Path
-from typing import Dict, List, Tuple, Any, Optional
+from typing import Dict, List, Tuple, Any, Optional, Sequence, Union
+
+import numpy as np
+
+from .density_index import DensityIndex
+from .density_pack import find_density_packs, read_density_pack
+from .search_cache import SearchCache
+from .vocabulary import Vocabulary
+from .units import UNITS, UNIT_UNKNOWN, UNIT_VOLUME, UNIT_WEIGHT, UNIT_COUNT
 
 class KnowledgeBase:
-    def __init__(self, base_path="data/knowledge_base"):
+    def __init__(self, base_path="data/knowledge_base", journal: bool = True, compact_every: int = 1000,
+                 cache_size: Optional[int] = 100000, cache_ttl: Optional[float] = None,
+                 negative_ttl: Optional[float] = 24 * 3600, density_packs: Optional[Sequence] = None,
+                 read_only: bool = False):
         self.base_path = Path(base_path)
         self.densities_path = self.base_path / "densities.json"
         self.conversions_path = self.base_path / "conversions.json"
         self.search_cache_path = self.base_path / "search_cache.json"
+        self.journal_path = self.base_path / "journal.jsonl"
+        
+        # Journal mode appends each mutation as a single record and only
+        # rewrites the JSON snapshots when the journal is compacted.
+        self.journal = journal
+        self.compact_every = compact_every
+        self._journal_file = None
+        self._journal_size = 0
+        self._dirty = False
+        
+        # A read-only snapshot never writes to disk; its mutations are kept
+        # in memory until export_delta() hands them to the owning process.
+        self.read_only = read_only
+        self._delta: List[Tuple[str, str, Any]] = []
+        
+        # Searches run on worker threads, so mutations of the cache, the
+        # density table and the journal file are serialized
+        self._lock = threading.RLock()
         
         # Ensure directories exist
         self.base_path.mkdir(parents=True, exist_ok=True)
         
+        # Mutations that did not make it into a snapshot before the last exit
+        self._journal_records = self._read_journal()
+        
         # Load or initialize knowledge bases
-        self.densities = self._load_or_create(self.densities_path, self._initial_densities())
-        self.conversions = self._load_or_create(self.conversions_path, self._initial_conversions())
-        self.search_cache = self._load_or_create(self.search_cache_path, {})
+        self.densities = self._load_or_create(self.densities_path, self._initial_densities(), "densities")
+        self.conversions = self._load_or_create(self.conversions_path, self._initial_conversions(), "conversions")
+        self._pack_names = self._load_density_packs(density_packs)
+        self.search_cache = SearchCache(cache_size, cache_ttl, negative_ttl)
+        self.search_cache.load(self._load_or_create(self.search_cache_path, {}, "search_cache"))
+        
+        # Substring index for density lookups that miss the exact key
+        self.density_index = DensityIndex(self.densities)
+        
+        # Interned unit and ingredient IDs with per-ID factor and density arrays
+        self._build_unit_table()
+        self._build_ingredient_table()
+        
+        self._journal_size = sum(len(records) for records in self._journal_records.values())
+        self._dirty = self._journal_size > 0
+        self._journal_records = {}
     
-    def _load_or_create(self, path: Path, default_data: Dict) -> Dict:
-        """Load JSON file or create it with default data if it doesn't exist."""
+    def _load_or_create(self, path: Path, default_data: Dict, table: Optional[str] = None) -> Dict:
+        """Load JSON file or create it with default data, then replay journaled mutations."""
         if path.exists():
             with open(path, 'r') as f:
-                return json.load(f)
+                data = json.load(f)
         else:
-            with open(path, 'w') as f:
-                json.dump(default_data, f, indent=2)
-            return default_data
+            self._write_json(path, default_data)
+            data = default_data
+        
+        for key, value in self._journal_records.get(table, []):
+            data[key] = value
+        
+        return data
     
-    def save(self):
-        """Save all knowledge bases to disk."""
-        with open(self.densities_path, 'w') as f:
-            json.dump(self.densities, f, indent=2)
+    def _load_density_packs(self, packs: Optional[Sequence] = None) -> set:
+        """Fill in densities from density packs, oldest version first.
+        
+        packs defaults to every pack in base_path/packs. Densities the
+        knowledge base already has take precedence over packs. Returns the
+        names that came only from packs, which are not written to snapshots.
+        """
+        self.density_pack_versions: List[str] = []
+        paths = find_density_packs(self.base_path / "packs") if packs is None else packs
+        
+        pack_names = set()
+        for path in paths:
+            try:
+                pack = read_density_pack(path)
+            except (OSError, ValueError) as e:
+                print(f"Could not load density pack {path}: {e}")
+                continue
+            
+            for name, density in pack["densities"].items():
+                if name not in self.densities or name in pack_names:
+                    self.densities[name] = density
+                    pack_names.add(name)
+            self.density_pack_versions.append(pack["version"])
+        
+        return pack_names
+    
+    def _read_journal(self) -> Dict[str, List[Tuple[str, Any]]]:
+        """Read journal records grouped by table, in the order they were written."""
+        records = {}
+        if not self.journal_path.exists():
+            return records
+        
+        with open(self.journal_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    records.setdefault(record["t"], []).append((record["k"], record["v"]))
+                except (ValueError, KeyError):
+                    # A torn write from a crash can only affect the last line
+                    continue
+        
+        return records
+    
+    def _open_journal(self):
+        """Open the journal for appending, starting a new line after one torn by a crash."""
+        torn = False
+        if self.journal_path.exists() and self.journal_path.stat().st_size > 0:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
         
-        with open(self.conversions_path, 'w') as f:
-            json.dump(self.conversions, f, indent=2)
+        journal_file = open(self.journal_path, 'a')
+        if torn:
+            journal_file.write("\n")
+        return journal_file
+    
+    def _record(self, table: str, key: str, value: Any):
+        """Persist a single mutation, either as a journal record or by rewriting the snapshots."""
+        with self._lock:
+            self._dirty = True
+            
+            if self.read_only:
+                self._delta.append((table, key, value))
+                return
+            
+            if not self.journal:
+                self.save()
+                return
+            
+            if self._journal_file is None:
+                self._journal_file = self._open_journal()
+            self._journal_file.write(json.dumps({"t": table, "k": key, "v": value}) + "\n")
+            self._journal_file.flush()
+            self._journal_size += 1
+            
+            if self._journal_size >= self.compact_every:
+                self.save()
+    
+    def _write_json(self, path: Path, data: Dict):
+        """Atomically replace a JSON file so a crash never leaves a half-written snapshot."""
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    
+    def save(self):
+        """Save all knowledge bases to disk and compact the journal into the snapshots."""
+        with self._lock:
+            if not self._dirty or self.read_only:
+                return
+            
+            self._write_json(self.densities_path, self._own_densities())
+            self._write_json(self.conversions_path, self.conversions)
+            self._write_json(self.search_cache_path, self.search_cache.to_dict())
+            
+            # Snapshots now contain every journaled mutation. Replaying a journal
+            # that survives a crash right here is harmless because records are idempotent.
+            if self._journal_file is not None:
+                self._journal_file.close()
+                self._journal_file = None
+            if self.journal_path.exists():
+                self.journal_path.unlink()
+            
+            self._journal_size = 0
+            self._dirty = False
+    
+    def flush(self):
+        """Make the mutations so far durable by syncing the journal, without compacting it.
         
-        with open(self.search_cache_path, 'w') as f:
-            json.dump(self.search_cache, f, indent=2)
+        Much cheaper than save(), which rewrites every snapshot, so this is
+        what batch boundaries call; compaction happens every compact_every
+        records and when save() is called at the end of a run.
+        """
+        with self._lock:
+            if self.read_only:
+                return
+            if not self.journal:
+                self.save()
+                return
+            if self._journal_file is not None:
+                self._journal_file.flush()
+                os.fsync(self._journal_file.fileno())
+    
+    def export_delta(self) -> List[Tuple[str, str, Any]]:
+        """Take the mutations made since the last call, as (table, key, value) journal records."""
+        with self._lock:
+            delta, self._delta = self._delta, []
+        return delta
+    
+    def apply_delta(self, delta: Sequence[Tuple[str, str, Any]]):
+        """Apply and persist mutations exported by another knowledge base, in order."""
+        with self._lock:
+            densities_changed = False
+            for table, key, value in delta:
+                if table == "densities":
+                    self.densities[key] = value
+                    self._pack_names.discard(key)
+                    self.density_index.add(key)
+                    densities_changed = True
+                elif table == "search_cache":
+                    self.search_cache.set_record(key, value)
+                self._record(table, key, value)
+            
+            if densities_changed:
+                self._invalidate_densities()
+    
+    def _own_densities(self) -> Dict[str, float]:
+        """Densities excluding those that only came from density packs."""
+        if not self._pack_names:
+            return self.densities
+        return {name: density for name, density in self.densities.items() if name not in self._pack_names}
     
     def get_density(self, ingredient: str) -> Optional[float]:
         """Get density for an ingredient (g/cup)."""
-        # Normalize ingredient name
-        normalized = self._normalize_ingredient(ingredient)
+        return self.get_density_by_id(self.ingredient_id(ingredient))
+    
+    def get_exact_density(self, ingredient: str) -> Optional[float]:
+        """Density stored under exactly this ingredient's normalized name (g/cup), without partial matches."""
+        return self.densities.get(self._normalize_ingredient(ingredient))
+    
+    def get_density_by_id(self, ingredient_id: int) -> Optional[float]:
+        """Get density for an interned ingredient ID (g/cup)."""
+        if not self._density_resolved[ingredient_id]:
+            density = self._lookup_density(self.ingredient_vocab.name(ingredient_id))
+            self._density_by_id[ingredient_id] = np.nan if density is None else density
+            self._density_resolved[ingredient_id] = True
         
+        density = self._density_by_id[ingredient_id]
+        return None if np.isnan(density) else float(density)
+    
+    def _lookup_density(self, normalized: str) -> Optional[float]:
+        """Resolve the density for a normalized ingredient name from the density table."""
         # Direct lookup
         if normalized in self.densities:
             return self.densities[normalized]
         
-        # Try to find partial matches
-        for key, value in self.densities.items():
-            if key in normalized or normalized in key:
-                return value
+        # Try to find partial matches, preferring the most specific key
+        key = self.density_index.lookup(normalized)
+        if key is not None:
+            return self.densities[key]
         
         return None
     
     def add_density(self, ingredient: str, density: float):
         """Add or update density information."""
         normalized = self._normalize_ingredient(ingredient)
-        self.densities[normalized] = density
-        self.save()
+        with self._lock:
+            self.densities[normalized] = density
+            self._pack_names.discard(normalized)
+            self.density_index.add(normalized)
+            self._invalidate_densities()
+            self._record("densities", normalized, density)
     
     def convert_to_metric(self, quantity: float, unit: str, ingredient: str) -> Tuple[float, str]:
         """Convert a measurement to metric."""
-        unit = unit.lower().strip()
+        return self.convert_code(quantity, self.unit_code(unit))
+    
+    def convert_code(self, quantity: float, unit_code: int) -> Tuple[float, str]:
+        """Convert a measurement given as a unit code to metric."""
+        kind = self._unit_kinds[unit_code]
         
         # Volume to volume conversions
-        if unit in self.conversions["volume"]:
-            ml_value = quantity * self.conversions["volume"][unit]
+        if kind == UNIT_VOLUME:
+            ml_value = quantity * self._unit_factors[unit_code]
             
             # For small volumes, return in ml
             if ml_value < 100:
@@ -80,8 +294,8 @@ class KnowledgeBase:
                 return ml_value / 1000, "L"
         
         # Weight to weight conversions
-        elif unit in self.conversions["weight"]:
-            g_value = quantity * self.conversions["weight"][unit]
+        elif kind == UNIT_WEIGHT:
+            g_value = quantity * self._unit_factors[unit_code]
             
             # For small weights, return in grams
             if g_value < 1000:
@@ -90,44 +304,154 @@ class KnowledgeBase:
             else:
                 return g_value / 1000, "kg"
         
-        # Volume to weight conversions (using density)
-        elif unit in self.conversions["volume_units"]:
-            ml_value = quantity * self.conversions["volume"][unit]
-            density = self.get_density(ingredient)
-            
-            if density:
-                # Convert volume to weight using density
-                g_value = ml_value * density / 240  # Density is g/cup, and 1 cup = 240ml
-                if g_value < 1000:
-                    return g_value, "g"
-                else:
-                    return g_value / 1000, "kg"
-            else:
-                # If no density available, return volume
-                if ml_value < 100:
-                    return ml_value, "ml"
-                else:
-                    return ml_value / 1000, "L"
+        # Count units and unknown units (no conversion needed)
+        return quantity, self.unit_vocab.name(unit_code)
+    
+    def _build_unit_table(self):
+        """Intern the known units and record their kind and metric factor by unit code."""
+        self.unit_vocab = Vocabulary()
+        self._unit_kinds: List[int] = []
+        self._unit_factors: List[float] = []
+        self._unit_arrays = None
+        
+        for table in ("volume", "weight", "count_units"):
+            for unit in self.conversions[table]:
+                self.unit_vocab.intern(unit)
+        self._extend_unit_table()
+    
+    def _extend_unit_table(self):
+        """Give every unit interned since the last call its kind and factor."""
+        while len(self._unit_kinds) < len(self.unit_vocab):
+            kind, factor = self._resolve_unit(self.unit_vocab.name(len(self._unit_kinds)))
+            self._unit_kinds.append(kind)
+            self._unit_factors.append(factor)
+            self._unit_arrays = None
+    
+    def _resolve_unit(self, unit: str) -> Tuple[int, float]:
+        """Kind and factor of a unit spelling, trying the spelling itself and then its canonical unit.
+        
+        The conversion tables are checked in order: volume, weight, count units.
+        """
+        for spelling in (unit, UNITS.canonical(unit)):
+            if spelling in self.conversions["volume"]:
+                return UNIT_VOLUME, self.conversions["volume"][spelling]
+            if spelling in self.conversions["weight"]:
+                return UNIT_WEIGHT, self.conversions["weight"][spelling]
+            if spelling in self.conversions["count_units"]:
+                return UNIT_COUNT, 1.0
         
-        # Count units (no conversion needed)
-        elif unit in self.conversions["count_units"]:
-            return quantity, unit
+        return UNIT_UNKNOWN, 1.0
+    
+    def unit_code(self, unit: str) -> int:
+        """Integer code for a unit string. Unknown units get a code that converts as a no-op."""
+        code = self.unit_vocab.intern(unit)
+        if code >= len(self._unit_kinds):
+            self._extend_unit_table()
+        return code
+    
+    def unit_kind(self, unit_code: int) -> int:
+        """Kind of a unit code: UNIT_VOLUME, UNIT_WEIGHT, UNIT_COUNT or UNIT_UNKNOWN."""
+        return self._unit_kinds[unit_code]
+    
+    def encode_units(self, units: Sequence[str]) -> np.ndarray:
+        """Encode a column of unit strings into unit codes, looking up each distinct unit once."""
+        codes = self.unit_vocab.encode(units)
+        self._extend_unit_table()
+        return codes
+    
+    def _build_ingredient_table(self):
+        """Set up ingredient IDs with a flat array of resolved densities."""
+        self.ingredient_vocab = Vocabulary()
+        self._density_by_id = np.full(64, np.nan)
+        self._density_resolved = np.zeros(64, dtype=bool)
+    
+    def ingredient_id(self, ingredient: str) -> int:
+        """Intern an ingredient name and return its ID."""
+        ingredient_id = self.ingredient_vocab.intern(ingredient)
+        if ingredient_id >= len(self._density_by_id):
+            grow = len(self._density_by_id)
+            self._density_by_id = np.concatenate([self._density_by_id, np.full(grow, np.nan)])
+            self._density_resolved = np.concatenate([self._density_resolved, np.zeros(grow, dtype=bool)])
+        return ingredient_id
+    
+    def _invalidate_densities(self):
+        """Forget resolved densities; a new key can be a better partial match for existing IDs."""
+        self._density_resolved[:] = False
+    
+    def convert_many(self, quantities: Union[Sequence[float], np.ndarray],
+                     units: Union[Sequence[Any], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Convert many measurements to metric in one vectorized pass.
+        
+        Accepts NumPy arrays, pandas Series or lists of quantities and of unit
+        codes (from unit_code/encode_units) or unit strings. Returns an array of
+        metric quantities and an object array of unit names, matching what
+        convert_to_metric returns element by element.
+        """
+        quantities = np.asarray(quantities, dtype=float)
+        codes = np.asarray(units)
+        if codes.dtype.kind not in "iu":
+            codes = self.encode_units(codes)
         
-        # Unknown unit
-        return quantity, unit
+        if self._unit_arrays is None:
+            self._unit_arrays = (
+                np.array(self._unit_kinds, dtype=np.int8),
+                np.array(self._unit_factors, dtype=float),
+                np.array(self.unit_vocab.names, dtype=object)
+            )
+        kinds, factors, names = self._unit_arrays
+        
+        kind = kinds[codes]
+        base = quantities * factors[codes]
+        is_volume = kind == UNIT_VOLUME
+        is_weight = kind == UNIT_WEIGHT
+        large_volume = is_volume & ~(base < 100)
+        large_weight = is_weight & ~(base < 1000)
+        
+        values = np.where(is_volume | is_weight, base, quantities)
+        values = np.where(large_volume | large_weight, base / 1000, values)
+        
+        metric_units = names[codes]
+        metric_units[is_volume] = "ml"
+        metric_units[large_volume] = "L"
+        metric_units[is_weight] = "g"
+        metric_units[large_weight] = "kg"
+        
+        return values, metric_units
     
     def _normalize_ingredient(self, ingredient: str) -> str:
         """Normalize ingredient name for consistent lookup."""
-        return ingredient.lower().strip()
+        return Vocabulary.normalize(ingredient)
     
     def add_to_cache(self, query: str, result: Any):
         """Add search result to cache."""
-        self.search_cache[query] = result
-        self.save()
+        with self._lock:
+            self.search_cache.set(query, result)
+            self._record("search_cache", query, self.search_cache.record(query))
+    
+    def add_negative_to_cache(self, query: str):
+        """Record that a search found nothing, so it is not repeated until the entry expires."""
+        with self._lock:
+            self.search_cache.set(query, None, negative=True)
+            self._record("search_cache", query, self.search_cache.record(query))
+    
+    def get_from_cache(self, query: str, default: Any = None) -> Optional[Any]:
+        """Get search result from cache.
+        
+        Negative entries return None; pass search_cache.MISSING as default to
+        tell them apart from queries that were never cached.
+        """
+        with self._lock:
+            return self.search_cache.get(query, default)
+    
+    def peek_cache(self, query: str, default: Any = None) -> Optional[Any]:
+        """Like get_from_cache(), but not counted in cache_stats(), for re-checks after a counted miss."""
+        with self._lock:
+            return self.search_cache.peek(query, default)
     
-    def get_from_cache(self, query: str) -> Optional[Any]:
-        """Get search result from cache."""
-        return self.search_cache.get(query)
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit, miss and eviction counters for the search cache."""
+        with self._lock:
+            return self.search_cache.stats()
     
     def _initial_conversions(self) -> Dict:
         """Initialize conversion factors."""
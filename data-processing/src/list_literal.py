@@ -0,0 +1,72 @@
+# src/list_literal.py
+
+import ast
+import re
+from typing import Any, List, Optional, Sequence
+
+# One quoted item of a list literal and the separator after it, as Python's repr() writes them
+_ITEM = re.compile(r"""\s*(?:'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)")\s*(,|\])""", re.DOTALL)
+_EMPTY = re.compile(r'\[\s*\]')
+
+# Lists whose items are single-quoted without escapes, the bulk of the dataset, e.g. "['salt', 'eggs']"
+_SIMPLE = re.compile(r"\['[^'\\]*'(?:, '[^'\\]*')*\]")
+
+def _scan_list(text: str) -> Optional[List[str]]:
+    """Items of a list literal of quoted strings, or None if text is not one."""
+    text = text.strip()
+    if not text.startswith('['):
+        return None
+    if _EMPTY.fullmatch(text):
+        return []
+
+    items = []
+    position = 1
+    while True:
+        match = _ITEM.match(text, position)
+        if match is None:
+            return None
+        single, double, separator = match.groups()
+        group = 1 if single is not None else 2
+        item = match.group(group)
+        if '\\' in item:
+            # Escapes are rare; let the literal parser decode this one item, quotes included
+            item = ast.literal_eval(text[match.start(group) - 1:match.end(group) + 1])
+        items.append(item)
+        position = match.end()
+        if separator == ']':
+            return items if text[position:].strip() == '' else None
+        if text[position:].lstrip().startswith(']'):
+            # Trailing comma
+            return items if text[position:].strip() == ']' else None
+
+def decode_list_literal(text: str) -> List[Any]:
+    """Decode a list literal such as "['2 cups flour', 'salt']" without eval().
+
+    Simple lists are split directly and other lists of quoted strings are
+    scanned. Anything else goes to ast.literal_eval, which only accepts
+    literals. Text that isn't a list or tuple literal at all is split on
+    commas, as a plain ingredient list.
+    """
+    if _SIMPLE.fullmatch(text):
+        return text[2:-2].split("', '")
+
+    items = _scan_list(text)
+    if items is not None:
+        return items
+
+    try:
+        value = ast.literal_eval(text.strip())
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        value = None
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return text.split(',')
+
+def decode_list_column(values: Sequence) -> List[Any]:
+    """Decode a whole column of list literals, returning other values (e.g. NaN) unchanged.
+
+    pandas string methods loop in Python for object columns and measured
+    slower than one pass with the simple-list fast path, so that is what
+    this does (see benchmarks/list_decoding.py).
+    """
+    return [decode_list_literal(value) if isinstance(value, str) else value for value in values]
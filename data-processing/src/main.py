@@ -3,93 +3,480 @@
 import os
 import pandas as pd
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Set, Tuple
 from tqdm import tqdm
-import json
 import argparse
+import multiprocessing
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
 from .knowledge_base import KnowledgeBase
+from .sqlite_store import SQLiteKnowledgeBase
 from .web_search import WebSearchManager
+from .backends import create_backend
 from .parser import RecipeParser
 from .converter import RecipeConverter
+from .async_search import AsyncWebSearchManager
+from .records import RECORDS_COLUMN
+from .checkpoint import CheckpointedOutput
+from .parquet_output import ParquetOutput
 
-def process_recipes(input_file: str, output_file: str, batch_size: int = 10):
-    """Process recipes from input CSV and save to output CSV."""
+def create_knowledge_base(storage: str = "json", density_packs: Optional[List[str]] = None,
+                          read_only: bool = False, base_path: str = "data/knowledge_base") -> KnowledgeBase:
+    """Create the knowledge base for the requested storage backend.
+    
+    density_packs defaults to the packs in the knowledge base's packs directory.
+    read_only gives a JSON knowledge base that keeps its changes in memory;
+    SQLite knowledge bases are always shared and written directly.
+    """
+    if storage == "sqlite":
+        return SQLiteKnowledgeBase(base_path, density_packs=density_packs)
+    return KnowledgeBase(base_path, density_packs=density_packs, read_only=read_only)
+
+def create_output(output_format: str, output_file: str, input_file: str, row_group_size: int = 10000,
+                  settings: Optional[Dict] = None):
+    """Create the output writer for a format: csv (JSON strings in CSV, resumable) or parquet.
+    
+    settings are the options a resumed csv run must share with the run it continues.
+    """
+    if output_format == "parquet":
+        return ParquetOutput(output_file, input_file, row_group_size)
+    if output_format == "csv":
+        return CheckpointedOutput(output_file, input_file, settings)
+    raise ValueError(f"Unknown output format {output_format!r}")
+
+# Input columns the conversion reads
+RECIPE_COLUMNS = ['name', 'ingredients', 'steps']
+
+def detect_separator(input_file: str) -> str:
+    """Tab if the header line has more tabs than commas, otherwise comma."""
+    with open(input_file, 'r', newline='') as f:
+        header = f.readline()
+    return '\t' if header.count('\t') > header.count(',') else ','
+
+def read_recipes(input_file: str) -> Optional[pd.DataFrame]:
+    """Read all input recipes. Returns None if the file can't be read."""
+    try:
+        return pd.read_csv(input_file, sep=detect_separator(input_file))
+    except Exception as e:
+        print(f"Could not read file: {e}")
+        return None
+
+def iter_recipe_chunks(input_file: str, chunk_size: int, keep_columns: Optional[List[str]] = None):
+    """Read the input recipes chunk_size rows at a time, only loading the columns that are used.
+    
+    Those are RECIPE_COLUMNS plus keep_columns, which are passed through to the
+    output. Rows keep their position in the file as their index.
+    """
+    wanted = set(RECIPE_COLUMNS) | set(keep_columns or [])
+    return pd.read_csv(input_file, sep=detect_separator(input_file), chunksize=chunk_size,
+                       usecols=lambda column: column in wanted)
+
+def recipe_columns(df: pd.DataFrame) -> Tuple[List, List, List]:
+    """The name, ingredients and steps columns of the input as lists, for the batch APIs."""
+    defaults = {'name': '', 'ingredients': [], 'steps': []}
+    return tuple(df[column].tolist() if column in df else [defaults[column]] * len(df)
+                 for column in RECIPE_COLUMNS)
+
+def _assign_results(df: pd.DataFrame, start: int, columns: Dict[str, List]):
+    """Write result columns into the rows of df from position start, a column at a time."""
+    for column, values in columns.items():
+        # An object array keeps list values as single cells
+        df.iloc[start:start + len(values), df.columns.get_loc(column)] = pd.Series(values, dtype=object).to_numpy()
+
+def create_web_search(knowledge_base: KnowledgeBase, search_mode: str = "live",
+                      fixtures: str = "data/fixtures", replay_latency: float = 0.0,
+                      page_cache: bool = True, rate_share: int = 1) -> WebSearchManager:
+    """Create the web search manager for a search mode.
+    
+    record stores every search and page fetch under fixtures and replay
+    serves them offline with replay_latency seconds per call, without rate
+    limiting or retries. Both bypass the page cache, so every page is fetched
+    and recorded, and replays don't depend on pages cached by earlier runs.
+    With rate_share processes searching at once, each gets that share of the
+    usual query rate.
+    """
+    backend = create_backend(search_mode, fixtures, replay_latency)
+    if search_mode == "replay":
+        return WebSearchManager(knowledge_base, max_retries=1, delay=0, backend=backend, page_cache=False)
+    if search_mode == "record":
+        return WebSearchManager(knowledge_base, delay=2 * rate_share, page_cache=False, backend=backend)
+    return WebSearchManager(knowledge_base, delay=2 * rate_share, backend=backend,
+                            page_cache=None if page_cache else False)
+
+def _skip_rows(chunks, rows: int):
+    """Drop the first rows rows from a sequence of chunks."""
+    for df in chunks:
+        if rows >= len(df):
+            rows -= len(df)
+            continue
+        if rows:
+            df = df.iloc[rows:].copy()
+            rows = 0
+        yield df
+
+def _process_batches(df: pd.DataFrame, parser: RecipeParser, converter: RecipeConverter,
+                     async_search: AsyncWebSearchManager, batch_size: int, commit, progress: bool = True):
+    """Convert the rows batch by batch, doing web lookups as they come up (or per batch with async_search).
+    
+    Each batch is parsed and converted column-wise and its results are
+    written back in bulk. commit is called with the converted rows of each batch.
+    """
+    names, ingredients, steps = recipe_columns(df)
+    
+    for i in range(0, len(df), batch_size):
+        if progress:
+            print(f"Processing batch {i//batch_size + 1}/{(len(df) + batch_size - 1)//batch_size}...")
+        recipes = parser.parse_batch(names[i:i+batch_size], ingredients[i:i+batch_size], steps[i:i+batch_size])
+        
+        records = None
+        if async_search is not None:
+            records = async_search.run(converter.prefetch_batch(recipes, async_search))
+        
+        results = converter.convert_batch(
+            tqdm(recipes, desc="Processing recipes", disable=not progress), df.index[i:i+batch_size], records
+        )
+        _assign_results(df, i, results)
+        commit(df.iloc[i:i+batch_size])
+
+def _process_offline_first(df: pd.DataFrame, parser: RecipeParser, converter: RecipeConverter,
+                           async_search: AsyncWebSearchManager, knowledge_base: KnowledgeBase,
+                           web_search: WebSearchManager, batch_size: int, progress: bool = True):
+    """Convert every row from local knowledge first, then resolve all missing lookups in bulk.
+    
+    Pass one converts each row with web lookups deferred and queues the
+    lookups it missed. The deduplicated queue is then resolved concurrently
+    and only the rows that were waiting on it are converted again. Rows whose
+    new quantities need further lookups (densities) go round again.
+    """
+    pending: Dict[int, Dict] = {}
+    queue: Set[Tuple[str, ...]] = set()
+    occurrences = 0
+    names, ingredients, steps = recipe_columns(df)
+    
+    for i in range(0, len(df), batch_size):
+        if progress:
+            print(f"Processing batch {i//batch_size + 1}/{(len(df) + batch_size - 1)//batch_size}...")
+        recipes = parser.parse_batch(names[i:i+batch_size], ingredients[i:i+batch_size], steps[i:i+batch_size])
+        batch_index = df.index[i:i+batch_size]
+        results = {'standard_ingredients': [], 'metric_ingredients': [], RECORDS_COLUMN: []}
+        
+        for position, recipe in enumerate(tqdm(recipes, desc="Processing recipes", disable=not progress)):
+            # Rows are converted one at a time to tell which of them missed a lookup
+            with converter.deferred_lookups() as lookups:
+                columns = converter.convert_batch([recipe], batch_index[position:position+1])
+            for column, values in columns.items():
+                results[column] += values
+            
+            if lookups:
+                pending[i + position] = recipe
+                queue |= lookups
+                occurrences += len(lookups)
+        
+        _assign_results(df, i, results)
+        knowledge_base.flush()
+    
+    if progress:
+        print(f"{len(pending)} recipes need {len(queue)} unique web lookups ({occurrences} occurrences).")
+    
+    resolved: Set[Tuple[str, ...]] = set()
+    while queue:
+        if progress:
+            print(f"Resolving {len(queue)} web lookups...")
+        async_search.run(converter.resolve_lookups(queue, async_search))
+        knowledge_base.flush()
+        web_search.save()
+        resolved |= queue
+        queue = set()
+        
+        waiting = {}
+        for position, recipe in tqdm(pending.items(), total=len(pending), desc="Patching recipes", disable=not progress):
+            try:
+                with converter.deferred_lookups() as lookups:
+                    standard_ingredients_str, metric_ingredients_str, records = converter.convert_recipe(recipe)
+            except Exception as e:
+                print(f"Error processing recipe at index {df.index[position]}: {e}")
+                continue
+            _assign_results(df, position, {'standard_ingredients': [standard_ingredients_str],
+                                           'metric_ingredients': [metric_ingredients_str],
+                                           RECORDS_COLUMN: [records]})
+            
+            # Lookups that failed stay unresolved instead of being retried forever
+            new_lookups = lookups - resolved
+            if new_lookups:
+                waiting[position] = recipe
+                queue |= new_lookups
+        pending = waiting
+
+# Components of a worker process, set up by _init_worker
+_worker: Optional[Dict] = None
+
+def _init_worker(options: Dict):
+    """Give a worker process its own parser, converter and knowledge base snapshot."""
+    global _worker
+    knowledge_base = create_knowledge_base(options["storage"], options["density_packs"], read_only=True,
+                                           base_path=options["knowledge_base_path"])
+    # Workers share the query rate, and the page cache index is owned by the main process
+    web_search = create_web_search(knowledge_base, options["search_mode"], options["fixtures"],
+                                   options["replay_latency"], page_cache=False, rate_share=options["workers"])
+    converter = RecipeConverter(knowledge_base, web_search)
+    concurrency = options["concurrency"]
+    _worker = {
+        "options": options,
+        "knowledge_base": knowledge_base,
+        "web_search": web_search,
+        "parser": RecipeParser(),
+        "converter": converter,
+        "async_search": AsyncWebSearchManager(web_search, concurrency)
+                        if concurrency > 1 or options["offline_first"] else None
+    }
+
+def _convert_shard(df: pd.DataFrame) -> Tuple[pd.DataFrame, List]:
+    """Convert a shard in a worker process. Returns the converted rows and the knowledge base changes."""
+    options = _worker["options"]
+    knowledge_base = _worker["knowledge_base"]
+    df['standard_ingredients'] = None
+    df['metric_ingredients'] = None
+    df[RECORDS_COLUMN] = None
+    
+    if options["offline_first"]:
+        _process_offline_first(df, _worker["parser"], _worker["converter"], _worker["async_search"],
+                               knowledge_base, _worker["web_search"], options["batch_size"], progress=False)
+    else:
+        _process_batches(df, _worker["parser"], _worker["converter"], _worker["async_search"],
+                         options["batch_size"], lambda rows: None, progress=False)
+    
+    # Shared (SQLite) knowledge bases are written directly; snapshots hand back their changes
+    knowledge_base.flush()
+    return df, knowledge_base.export_delta()
+
+def _split_shards(chunks, shard_size: int):
+    """Cut a sequence of chunks into shards of at most shard_size rows."""
+    for df in chunks:
+        for i in range(0, len(df), shard_size):
+            yield df.iloc[i:i+shard_size]
+
+def _process_sharded(chunks, workers: int, shard_size: int, options: Dict, commit):
+    """Convert shards in a pool of worker processes and commit them in input order.
+    
+    commit is called with each shard's rows and knowledge base changes, in
+    shard order whatever order the workers finish in, so the output and the
+    merged knowledge base are the same on every run. At most two shards per
+    worker are in flight or waiting for an earlier shard.
+    """
+    shards = enumerate(_split_shards(chunks, shard_size))
+    context = multiprocessing.get_context("spawn")
+    
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(options,)) as pool:
+        running = {}
+        finished = {}
+        next_shard = 0
+        exhausted = False
+        
+        while True:
+            while not exhausted and len(running) + len(finished) < 2 * workers:
+                shard = next(shards, None)
+                if shard is None:
+                    exhausted = True
+                    break
+                number, df = shard
+                running[pool.submit(_convert_shard, df)] = number
+            
+            if not running and not finished:
+                break
+            
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished[running.pop(future)] = future.result()
+            
+            while next_shard in finished:
+                df, delta = finished.pop(next_shard)
+                print(f"Shard {next_shard + 1}: {len(df)} rows converted.")
+                commit(df, delta)
+                next_shard += 1
+
+def process_recipes(input_file: str, output_file: str, batch_size: int = 10, storage: str = "json",
+                    concurrency: int = 1, search_mode: str = "live", fixtures: str = "data/fixtures",
+                    replay_latency: float = 0.0, offline_first: bool = False,
+                    density_packs: Optional[List[str]] = None, chunk_size: Optional[int] = None,
+                    keep_columns: Optional[List[str]] = None, resume: bool = False,
+                    workers: int = 1, shard_size: int = 500, output_format: str = "csv",
+                    row_group_size: int = 10000, knowledge_base_path: Optional[str] = None):
+    """Process recipes from input CSV and save to output CSV.
+    
+    With concurrency above 1, the web lookups of each batch are run
+    concurrently before its rows are converted. search_mode selects live
+    searches, recording them as fixtures, or replaying recorded fixtures.
+    
+    With offline_first, rows are converted from local knowledge first and
+    each unique missing web lookup is resolved once afterwards, so the number
+    of searches is the number of unique unknowns rather than occurrences.
+    
+    With chunk_size, the input is streamed: chunk_size rows are read at a
+    time, only with the columns the conversion uses plus keep_columns, and
+    each chunk is appended to the output once converted. Memory use is then
+    bounded by the chunk size, and a crash keeps the chunks already written.
+    Offline-first lookups are resolved per chunk.
+    
+    Output is appended batch by batch (chunk by chunk in offline-first mode)
+    and a checkpoint is kept next to it. With resume, a run that was
+    interrupted continues after the last checkpoint.
+    
+    output_format parquet writes the ingredient lists as native list columns
+    plus the structured ingredient records, in row groups of row_group_size.
+    It needs pyarrow and can't be resumed.
+    
+    With workers above 1, rows are converted in shards of shard_size by a
+    pool of worker processes. Each worker has its own parser, converter and
+    read-only snapshot of the knowledge base; the densities and cache
+    entries they discover are merged back in shard order as shards are
+    written. Workers don't see each other's discoveries until the next run,
+    unless the knowledge base is stored in SQLite.
+    
+    The knowledge base is read from knowledge_base_path (data/knowledge_base
+    by default). Record and replay runs default to an empty knowledge base in
+    a temporary directory instead: its search cache would otherwise keep
+    cached queries from being recorded, and replays would both depend on and
+    write to the shared knowledge base. Density packs are then only used if
+    given explicitly.
+    """
+    if knowledge_base_path is None:
+        if search_mode in ("record", "replay"):
+            arguments = dict(locals())
+            with tempfile.TemporaryDirectory(prefix="knowledge_base-") as path:
+                return process_recipes(**{**arguments, "knowledge_base_path": path})
+        knowledge_base_path = "data/knowledge_base"
+    
     # Create output directory if it doesn't exist
     output_path = Path(output_file).parent
     output_path.mkdir(parents=True, exist_ok=True)
     
     # Initialize components
-    knowledge_base = KnowledgeBase()
-    web_search = WebSearchManager(knowledge_base)
+    knowledge_base = create_knowledge_base(storage, density_packs, base_path=knowledge_base_path)
+    web_search = create_web_search(knowledge_base, search_mode, fixtures, replay_latency)
     parser = RecipeParser()
     converter = RecipeConverter(knowledge_base, web_search)
+    async_search = AsyncWebSearchManager(web_search, concurrency) if concurrency > 1 or offline_first else None
     
     # Read input CSV
     # src/main.py (continued)
 
     print(f"Reading recipes from {input_file}...")
-    try:
-        df = pd.read_csv(input_file, sep='\t')
-    except Exception as e:
-        print(f"Error reading input file: {e}")
+    if chunk_size:
         try:
-            df = pd.read_csv(input_file)  # Try with default separator
+            chunks = iter_recipe_chunks(input_file, chunk_size, keep_columns)
         except Exception as e:
             print(f"Could not read file: {e}")
             return
+    else:
+        df = read_recipes(input_file)
+        if df is None:
+            return
+        print(f"Found {len(df)} recipes.")
+        chunks = [df]
     
-    print(f"Found {len(df)} recipes.")
+    # Streaming reads only the used and kept columns, so it shapes the output too
+    settings = {"storage": storage, "streamed": bool(chunk_size),
+                "keep_columns": sorted(keep_columns) if chunk_size and keep_columns else None}
+    try:
+        output = create_output(output_format, output_file, input_file, row_group_size, settings)
+    except ImportError as e:
+        print(f"Could not create output: {e}")
+        return
+    done = output.open(resume)
+    if done is None:
+        return
     
-    # Initialize result columns
-    df['standard_ingredients'] = None
-    df['metric_ingredients'] = None
+    def commit(rows: pd.DataFrame, delta: List = ()):
+        # Results first, then the knowledge they depend on, then the checkpoint
+        output.append(rows)
+        knowledge_base.apply_delta(delta)
+        knowledge_base.flush()
+        web_search.save()
+        output.checkpoint()
     
-    # Process in batches
-    for i in range(0, len(df), batch_size):
-        print(f"Processing batch {i//batch_size + 1}/{(len(df) + batch_size - 1)//batch_size}...")
-        batch = df.iloc[i:i+batch_size].copy()
+    print(f"Writing results to {output_file}...")
+    if workers > 1:
+        options = {
+            "storage": storage, "density_packs": density_packs, "search_mode": search_mode,
+            "fixtures": fixtures, "replay_latency": replay_latency, "concurrency": concurrency,
+            "offline_first": offline_first, "batch_size": batch_size, "workers": workers,
+            "knowledge_base_path": knowledge_base_path
+        }
+        _process_sharded(_skip_rows(chunks, done), workers, shard_size, options, commit)
+        chunks = []
+    
+    for df in _skip_rows(chunks, done):
+        if chunk_size:
+            print(f"Converting rows {output.rows}-{output.rows + len(df) - 1}...")
         
-        for idx, row in tqdm(batch.iterrows(), total=len(batch), desc="Processing recipes"):
-            try:
-                # Parse recipe
-                recipe = parser.parse_recipe_row(row)
-                
-                # Generate standard ingredients list
-                standard_ingredients = converter.generate_standard_ingredient_list(recipe)
-                standard_ingredients_str = json.dumps(standard_ingredients)
-                
-                # Generate metric ingredients list
-                metric_ingredients = converter.generate_metric_ingredient_list(standard_ingredients)
-                metric_ingredients_str = json.dumps(metric_ingredients)
-                
-                # Update dataframe
-                df.at[idx, 'standard_ingredients'] = standard_ingredients_str
-                df.at[idx, 'metric_ingredients'] = metric_ingredients_str
-            except Exception as e:
-                print(f"Error processing recipe at index {idx}: {e}")
-                # Set to empty lists for failed processing
-                df.at[idx, 'standard_ingredients'] = "[]"
-                df.at[idx, 'metric_ingredients'] = "[]"
+        # Initialize result columns
+        df['standard_ingredients'] = None
+        df['metric_ingredients'] = None
+        df[RECORDS_COLUMN] = None
         
-        # Save knowledge base after each batch to preserve progress
-        knowledge_base.save()
+        if offline_first:
+            _process_offline_first(df, parser, converter, async_search, knowledge_base, web_search, batch_size)
+            commit(df)
+        else:
+            _process_batches(df, parser, converter, async_search, batch_size, commit)
     
-    # Save results
-    print(f"Saving results to {output_file}...")
-    df.to_csv(output_file, index=False)
+    # Compact the journal into the snapshots once, now that the run is over
+    knowledge_base.save()
+    output.checkpoint(complete=True)
+    print(f"Search cache: {knowledge_base.cache_stats()}")
+    print(f"Ingredient memo: {converter.memo_stats()}")
+    if web_search.page_cache is not None:
+        print(f"Page cache: {web_search.page_cache.stats()}")
+    if async_search is not None:
+        async_search.close()
+    web_search.close()
     print("Conversion complete!")
 
 def main():
     """Main entry point."""
     parser = argparse.ArgumentParser(description='Convert recipe ingredients to standard and metric formats')
     parser.add_argument('--input', '-i', required=True, help='Input CSV file path')
-    parser.add_argument('--output', '-o', required=True, help='Output CSV file path')
+    parser.add_argument('--output', '-o', required=True, help='Output file path')
     parser.add_argument('--batch-size', '-b', type=int, default=10, help='Batch size for processing')
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json',
+                        help='Knowledge base storage backend (use sqlite to share it between workers)')
+    parser.add_argument('--concurrency', '-c', type=int, default=1,
+                        help='Number of concurrent web searches per batch (1 searches sequentially)')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='Stream the input this many rows at a time, appending each chunk to the output')
+    parser.add_argument('--keep-columns', nargs='*', default=None,
+                        help='Extra input columns to copy to the output when streaming (default: only the used ones)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue an interrupted run from the checkpoint next to the output')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help='Output format: CSV with JSON ingredient lists, or Parquet with list columns (needs pyarrow)')
+    parser.add_argument('--row-group-size', type=int, default=10000, help='Rows per Parquet row group')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                        help='Number of worker processes converting shards of the input in parallel')
+    parser.add_argument('--shard-size', type=int, default=500, help='Rows per shard with --workers')
+    parser.add_argument('--density-pack', action='append', dest='density_packs',
+                        help='Density pack to load (repeatable; default: every pack in the knowledge base packs directory)')
+    parser.add_argument('--offline-first', action='store_true',
+                        help='Convert everything from local knowledge first, then resolve unique web lookups in bulk')
+    parser.add_argument('--search-mode', choices=['live', 'record', 'replay'], default='live',
+                        help='Search live, record searches and pages as fixtures, or replay recorded fixtures offline')
+    parser.add_argument('--fixtures', default='data/fixtures', help='Fixture directory for record and replay')
+    parser.add_argument('--knowledge-base', default=None,
+                        help='Knowledge base directory (default: data/knowledge_base, '
+                             'or an empty temporary one for record and replay)')
+    parser.add_argument('--replay-latency', type=float, default=0.0,
+                        help='Synthetic latency in seconds added to each replayed search and page fetch')
     
     args = parser.parse_args()
     
-    process_recipes(args.input, args.output, args.batch_size)
+    process_recipes(args.input, args.output, args.batch_size, args.storage, args.concurrency,
+                    args.search_mode, args.fixtures, args.replay_latency, args.offline_first,
+                    args.density_packs, args.chunk_size, args.keep_columns,
+                    args.resume, args.workers, args.shard_size, args.format, args.row_group_size,
+                    args.knowledge_base)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,12 +1,29 @@
 # src/model_utils.py
 
-from unsloth import FastLanguageModel
+from typing import Optional
+
 import torch
 
+# Llama 3 Instruct without 4-bit quantization, for hosts without CUDA
+CPU_LLAMA_MODEL = "unsloth/llama-3-8b-Instruct"
+
+def pick_device(device: Optional[str] = None) -> str:
+    """The requested device, or the best one available: cuda, then mps, then cpu."""
+    if device:
+        return device
+    if torch.cuda.is_available():
+        return "cuda"
+    if getattr(torch.backends, "mps", None) is not None and torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
 def load_llama_model():
     """
     Load Meta-Llama-3-8B-Instruct model using Unsloth.
     """
+    # Imported here so other models load without unsloth installed
+    from unsloth import FastLanguageModel
+
     print("[🔄] Loading Meta-Llama-3-8B-Instruct model...")
     model, tokenizer = FastLanguageModel.from_pretrained(
     model_name = "unsloth/Meta-Llama-3-8B-Instruct-bnb-4bit",
@@ -17,3 +34,27 @@ def load_llama_model():
     FastLanguageModel.for_inference(model)
     print("[✅] Model loaded.")
     return model, tokenizer
+
+def load_model(model_name: Optional[str] = None, device: Optional[str] = None):
+    """
+    Load a causal language model and its tokenizer onto a device.
+
+    Without model_name, loads Llama 3 with Unsloth on CUDA and the full
+    precision Llama 3 weights with transformers on other devices, since
+    Unsloth needs a GPU. Any other Hugging Face model name (e.g. a tiny
+    stand-in such as sshleifer/tiny-gpt2 for tests) is loaded with transformers.
+    """
+    device = pick_device(device)
+    if model_name is None:
+        if device == "cuda":
+            return load_llama_model()
+        model_name = CPU_LLAMA_MODEL
+
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    print(f"[🔄] Loading {model_name}...")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForCausalLM.from_pretrained(model_name).to(device)
+    model.eval()
+    print("[✅] Model loaded.")
+    return model, tokenizer
@@ -0,0 +1,209 @@
+# src/page_cache.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+class PageCache:
+    """Persistent cache of the text extracted from fetched web pages.
+
+    Text is stored zlib-compressed in blobs named by the SHA-256 of their
+    content, so pages with identical text share one blob. An index maps each
+    URL to its blob together with the ETag and Last-Modified validators sent by
+    the server. Entries younger than max_age are used without any request;
+    older ones are revalidated with a conditional GET. When the blobs exceed
+    max_bytes the least recently used URLs are evicted. Safe to use from
+    several threads at once.
+    """
+
+    def __init__(self, base_path="data/knowledge_base/pages", max_bytes: int = 256 * 1024 * 1024,
+                 max_age: Optional[float] = 7 * 24 * 3600, save_every: int = 100,
+                 clock: Callable[[], float] = time.time):
+        self.base_path = Path(base_path)
+        self.blobs_path = self.base_path / "blobs"
+        self.index_path = self.base_path / "index.json"
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.save_every = save_every
+        self.clock = clock
+        self._lock = threading.RLock()
+
+        self.blobs_path.mkdir(parents=True, exist_ok=True)
+
+        # url -> {"hash", "size", "etag", "last_modified", "fetched"}; least recently used first
+        self._index: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # blob hash -> number of URLs pointing at it
+        self._refs: Dict[str, int] = {}
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._unsaved = 0
+
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load_index()
+
+    def _load_index(self):
+        """Load the URL index, dropping entries whose blob has gone missing."""
+        if not self.index_path.exists():
+            return
+
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+        except ValueError:
+            return
+
+        for url, entry in index.items():
+            if self._blob_path(entry["hash"]).exists():
+                self._link(url, entry)
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blobs_path / digest[:2] / (digest + ".z")
+
+    def _link(self, url: str, entry: Dict[str, Any]):
+        """Add an index entry and count its blob."""
+        self._index[url] = entry
+        digest = entry["hash"]
+        if digest not in self._refs:
+            self._refs[digest] = 0
+            self._sizes[digest] = entry["size"]
+            self._total_bytes += entry["size"]
+        self._refs[digest] += 1
+
+    def _unlink(self, url: str):
+        """Remove an index entry and delete its blob once no URL refers to it."""
+        self._release(self._index.pop(url)["hash"])
+
+    def _release(self, digest: str):
+        """Drop one reference to a blob, deleting it when it was the last."""
+        self._refs[digest] -= 1
+        if self._refs[digest] == 0:
+            del self._refs[digest]
+            self._total_bytes -= self._sizes.pop(digest)
+            try:
+                self._blob_path(digest).unlink()
+            except OSError:
+                pass
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Cached page for url as {"text", "etag", "last_modified", "fresh"}, or None.
+
+        Pages that are not fresh should be revalidated with the returned
+        validators before their text is trusted.
+        """
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            try:
+                with open(self._blob_path(entry["hash"]), 'rb') as f:
+                    text = zlib.decompress(f.read()).decode('utf-8')
+            except (OSError, zlib.error):
+                self._unlink(url)
+                self.misses += 1
+                return None
+
+            self._index.move_to_end(url)
+            fresh = self.max_age is None or entry["fetched"] + self.max_age > self.clock()
+            if fresh:
+                self.hits += 1
+            return {
+                "text": text,
+                "etag": entry.get("etag"),
+                "last_modified": entry.get("last_modified"),
+                "fresh": fresh
+            }
+
+    def put(self, url: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Store the extracted text of a page fetched from url."""
+        data = text.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+
+        with self._lock:
+            path = self._blob_path(digest)
+            if digest in self._refs:
+                size = self._sizes[digest]
+            else:
+                blob = zlib.compress(data)
+                size = len(blob)
+                path.parent.mkdir(exist_ok=True)
+                tmp_path = path.with_suffix(".tmp")
+                with open(tmp_path, 'wb') as f:
+                    f.write(blob)
+                os.replace(tmp_path, path)
+
+            # Link the new entry before releasing the old one, which may share its blob
+            previous = self._index.pop(url, None)
+            self._link(url, {
+                "hash": digest,
+                "size": size,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched": self.clock()
+            })
+            if previous is not None:
+                self._release(previous["hash"])
+            self._evict()
+            self._changed()
+
+    def revalidated(self, url: str):
+        """Mark a cached page as confirmed unchanged by the server (HTTP 304)."""
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is None:
+                return
+            entry["fetched"] = self.clock()
+            self.revalidations += 1
+            self._changed()
+
+    def _evict(self):
+        """Drop least recently used URLs until the blobs fit in max_bytes."""
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            self._unlink(next(iter(self._index)))
+            self.evictions += 1
+
+    def _changed(self):
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def save(self):
+        """Write the URL index to disk."""
+        with self._lock:
+            if not self._unsaved:
+                return
+            tmp_path = self.index_path.with_suffix(".json.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+            self._unsaved = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry counts, stored size and hit counters."""
+        with self._lock:
+            return {
+                "urls": len(self._index),
+                "blobs": len(self._refs),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "revalidations": self.revalidations,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
@@ -0,0 +1,152 @@
+# src/parquet_output.py
+
+import json
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; only Parquet output needs it
+    pa = None
+    pq = None
+
+from .records import RECORDS_COLUMN
+
+# Result columns holding rendered ingredient strings (JSON strings in CSV output)
+LIST_COLUMNS = ['standard_ingredients', 'metric_ingredients']
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet output needs pyarrow, which is not installed")
+
+def ingredient_type() -> "pa.DataType":
+    """Arrow type of one converted ingredient, with the fields of RecipeConverter.record_fields."""
+    _require_pyarrow()
+    return pa.struct([
+        ("quantity", pa.float64()),
+        ("quantity_text", pa.string()),
+        ("unit", pa.string()),
+        ("name", pa.string()),
+        ("metric_quantity", pa.float64()),
+        ("metric_unit", pa.string()),
+        ("source", pa.string()),
+        ("text", pa.string())
+    ])
+
+class ParquetOutput:
+    """Parquet output with native list columns instead of JSON strings.
+
+    standard_ingredients and metric_ingredients are lists of strings and
+    ingredient_records is a list of structs (see ingredient_type()), so
+    readers neither parse JSON nor load columns they don't ask for. Rows are
+    buffered and written as row groups of row_group_size, which bounds memory
+    and lets readers stream the file a row group at a time.
+
+    Has the interface of CheckpointedOutput, but a Parquet file is only
+    readable once checkpoint(complete=True) has written its footer, so runs
+    can't be resumed.
+    """
+
+    def __init__(self, output_file: str, input_file: str, row_group_size: int = 10000):
+        _require_pyarrow()
+        self.output_path = Path(output_file)
+        self.input_file = str(input_file)
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self._schema: Optional[pa.Schema] = None
+        self._writer: Optional[pq.ParquetWriter] = None
+        self._buffer: List[pa.Table] = []
+        self._buffered = 0
+
+    def open(self, resume: bool = False) -> Optional[int]:
+        """Start the output afresh. Returns None if asked to resume."""
+        if resume:
+            print("Parquet output can't be resumed; run again without --resume or with --format csv.")
+            return None
+        return 0
+
+    def append(self, df: pd.DataFrame):
+        """Buffer converted rows, writing every full row group."""
+        table = self._to_table(df)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.output_path, table.schema)
+        self._buffer.append(table)
+        self._buffered += len(table)
+        self.rows += len(df)
+
+        if self._buffered >= self.row_group_size:
+            buffered = pa.concat_tables(self._buffer)
+            full = len(buffered) - len(buffered) % self.row_group_size
+            self._writer.write_table(buffered.slice(0, full), row_group_size=self.row_group_size)
+            self._buffer = [buffered.slice(full)]
+            self._buffered = len(buffered) - full
+
+    def checkpoint(self, complete: bool = False):
+        """Write the last row group and the footer once the run is complete."""
+        if not complete:
+            return
+        if self._writer is None:
+            # No rows at all: still leave a readable file with the result columns
+            self._writer = pq.ParquetWriter(self.output_path, self._result_schema(pa.schema([])))
+        if self._buffered:
+            self._writer.write_table(pa.concat_tables(self._buffer), row_group_size=self.row_group_size)
+        self._writer.close()
+        self._buffer = []
+        self._buffered = 0
+
+    def _result_schema(self, input_schema: "pa.Schema") -> "pa.Schema":
+        fields = list(input_schema)
+        fields += [pa.field(column, pa.list_(pa.string())) for column in LIST_COLUMNS]
+        fields.append(pa.field(RECORDS_COLUMN, pa.list_(ingredient_type())))
+        return pa.schema(fields)
+
+    def _to_table(self, df: pd.DataFrame) -> "pa.Table":
+        inputs = pa.Table.from_pandas(df.drop(columns=LIST_COLUMNS + [RECORDS_COLUMN], errors='ignore'),
+                                      preserve_index=False)
+        if self._schema is None:
+            # Columns that are empty in the first rows are taken to be strings. pandas
+            # reads them as all-NaN float64 (or all-None object), which later rows with
+            # text in them couldn't be cast to.
+            self._schema = self._result_schema(pa.schema([
+                pa.field(field.name, pa.string()) if self._is_empty(inputs.column(i)) else field
+                for i, field in enumerate(inputs.schema)
+            ]))
+
+        columns = inputs.columns
+        columns += [pa.array([json.loads(value) if value else [] for value in df[column]], pa.list_(pa.string()))
+                    for column in LIST_COLUMNS]
+        columns.append(pa.array([records if records is not None else [] for records in df[RECORDS_COLUMN]],
+                                pa.list_(ingredient_type())))
+        return pa.Table.from_arrays(columns, names=self._schema.names).cast(self._schema)
+
+    @staticmethod
+    def _is_empty(column: "pa.ChunkedArray") -> bool:
+        return pa.types.is_null(column.type) or (
+            pa.types.is_floating(column.type) and len(column) > 0 and column.null_count == len(column)
+        )
+
+def read_converted(path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read converted recipes, loading only columns if given.
+
+    Parquet files are read column by column. CSV output is also accepted, with
+    its ingredient lists decoded from JSON; it has no ingredient_records.
+    """
+    if Path(path).suffix.lower() != ".parquet":
+        df = pd.read_csv(path, usecols=columns)
+        for column in LIST_COLUMNS:
+            if column in df:
+                df[column] = df[column].map(json.loads)
+        return df
+
+    _require_pyarrow()
+    return pq.read_table(path, columns=columns).to_pandas()
+
+def iter_converted(path, columns: Optional[List[str]] = None, batch_size: int = 10000) -> Iterator[pd.DataFrame]:
+    """Stream a Parquet output batch_size rows at a time, loading only columns if given."""
+    _require_pyarrow()
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield batch.to_pandas()
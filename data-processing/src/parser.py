@@ -1,51 +1,58 @@
 # src/parser.py
 
+import bisect
 import re
 import pandas as pd
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Sequence, Union
+
+from .list_literal import decode_list_column, decode_list_literal
+from .units import UNITS
 
 class RecipeParser:
     def __init__(self):
-        # Common measurement units
-        self.units = [
-            'cup', 'cups', 'tablespoon', 'tablespoons', 'tbsp', 'teaspoon', 'teaspoons', 'tsp',
-            'ounce', 'ounces', 'oz', 'pound', 'pounds', 'lb', 'lbs', 'gram', 'grams', 'g',
-            'kilogram', 'kilograms', 'kg', 'ml', 'milliliter', 'milliliters', 'liter', 'liters', 'l',
-            'pinch', 'pinches', 'dash', 'dashes', 'clove', 'cloves', 'piece', 'pieces', 'slice', 'slices',
-            'bunch', 'bunches', 'whole', 'can', 'cans', 'package', 'packages', 'pkg', 'jar', 'jars'
-        ]
+        # Common measurement units, longest first
+        self.units = UNITS.spellings
         
-        # Create regex pattern for measurements
-        self.measurement_pattern = re.compile(
-            r'(\d+(?:\.\d+)?(?:\s+\d+/\d+)?|\d+/\d+)\s*(' + '|'.join(self.units) + r')?\s+(?:of\s+)?(.+)',
-            re.IGNORECASE
-        )
+        # Regex pattern for measurements, compiled once in the unit registry
+        self.measurement_pattern = UNITS.measurement_pattern
         
         # Pattern for fractions
         self.fraction_pattern = re.compile(r'(\d+)/(\d+)')
+        
+        # Base ingredient names by raw ingredient, ingredients repeat across recipes
+        self._base_ingredients: Dict[str, str] = {}
     
     def parse_recipe_row(self, row: Dict) -> Dict:
         """Parse a recipe row from the dataset."""
-        result = {
-            'name': row.get('name', '').strip(),
-            'ingredients_list': self._parse_ingredients(row),
-            'steps': row.get('steps', [])
-        }
-        return result
+        return self._parse_recipe(row.get('name', ''), row.get('ingredients', []), row.get('steps', []))
     
-    def _parse_ingredients(self, row: Dict) -> List[str]:
-        """Extract ingredients from the row."""
-        # Get ingredients from the ingredients column
-        ingredients_raw = row.get('ingredients', [])
+    def parse_batch(self, names: Sequence, ingredients: Sequence, steps: Sequence) -> List[Union[Dict, Exception]]:
+        """Parse a batch of recipes given as columns of names, raw ingredient lists and steps.
         
-        # If ingredients is a string, convert to list
-        if isinstance(ingredients_raw, str):
+        Returns the parsed recipes in order, with the exception raised in
+        place of rows that can't be parsed (e.g. a missing name).
+        """
+        recipes = []
+        # Decode the ingredient list literals of the whole column at once
+        for name, ingredients_raw, recipe_steps in zip(names, decode_list_column(ingredients), steps):
             try:
-                # Try to evaluate as a Python list
-                ingredients_raw = eval(ingredients_raw)
-            except:
-                # If not a valid Python list, split by commas
-                ingredients_raw = ingredients_raw.split(',')
+                recipes.append(self._parse_recipe(name, ingredients_raw, recipe_steps))
+            except Exception as e:
+                recipes.append(e)
+        return recipes
+    
+    def _parse_recipe(self, name: str, ingredients_raw, steps) -> Dict:
+        return {
+            'name': name.strip(),
+            'ingredients_list': self._parse_ingredients(ingredients_raw),
+            'steps': steps
+        }
+    
+    def _parse_ingredients(self, ingredients_raw) -> List[str]:
+        """Extract ingredients from a raw ingredients value (a list or its string form)."""
+        # If ingredients is a string, decode it as a list literal (or split it by commas)
+        if isinstance(ingredients_raw, str):
+            ingredients_raw = decode_list_literal(ingredients_raw)
         
         # Clean ingredient names
         cleaned_ingredients = []
@@ -56,25 +63,54 @@ class RecipeParser:
         return cleaned_ingredients
     
     def extract_quantities_from_steps(self, recipe_name: str, ingredients: List[str], steps: List[str]) -> Dict[str, str]:
-        """Extract quantities from recipe steps."""
+        """Extract quantities from recipe steps.
+        
+        The steps are scanned once for quantity tokens and lowercased once for
+        ingredient mentions; each ingredient is then paired with the nearest
+        quantity that ends before its first mention, within window characters.
+        """
         quantities = {}
         combined_steps = ' '.join(steps) if isinstance(steps, list) else steps
         
+        # All quantity tokens in the text, in order
+        tokens = [
+            (match.start(), match.end(), match.group(1), match.group(2))
+            for match in UNITS.quantity_token_pattern.finditer(combined_steps)
+        ]
+        if not tokens:
+            return quantities
+        token_ends = [end for _, end, _, _ in tokens]
+        
+        # Convert to lowercase once for case-insensitive matching
+        text_lower = combined_steps.lower()
+        mentions = {}
+        
         # For each ingredient, try to find a quantity in the steps
         for ingredient in ingredients:
             # Extract base ingredient name (remove qualifiers like "fresh", "chopped", etc.)
             base_ingredient = self._get_base_ingredient(ingredient)
+            if not base_ingredient:
+                continue
             
-            # Look for measurements near the ingredient name
-            quantity = self._find_quantity_in_text(combined_steps, base_ingredient)
+            # First mention of the ingredient in the text
+            if base_ingredient not in mentions:
+                mentions[base_ingredient] = text_lower.find(base_ingredient)
+            ingredient_pos = mentions[base_ingredient]
             
-            if quantity:
-                quantities[ingredient] = quantity
+            if ingredient_pos >= 0:
+                # Look for measurements before the ingredient
+                quantity = self._nearest_quantity(tokens, token_ends, ingredient_pos)
+                if quantity:
+                    quantities[ingredient] = quantity
         
         return quantities
     
     def _get_base_ingredient(self, ingredient: str) -> str:
         """Extract the base ingredient name without qualifiers."""
+        base = self._base_ingredients.get(ingredient)
+        if base is not None:
+            return base
+        
         # Remove common qualifiers
         qualifiers = ['fresh', 'dried', 'chopped', 'minced', 'sliced', 'diced', 'ground', 'grated', 'shredded']
         base = ingredient.lower()
@@ -82,38 +118,23 @@ class RecipeParser:
         for qualifier in qualifiers:
             base = base.replace(qualifier, '').strip()
         
+        self._base_ingredients[ingredient] = base
         return base
     
-    def _find_quantity_in_text(self, text: str, ingredient: str) -> Optional[str]:
-        """Find quantity for an ingredient in text."""
-        # Convert to lowercase for case-insensitive matching
-        text_lower = text.lower()
-        ingredient_lower = ingredient.lower()
-        
-        # Search for the ingredient in the text
-        ingredient_pos = text_lower.find(ingredient_lower)
-        
-        if ingredient_pos >= 0:
-            # Look for measurements before the ingredient
-            # Check 100 characters before the ingredient position
-            search_start = max(0, ingredient_pos - 100)
-            text_before = text[search_start:ingredient_pos]
-            
-            # Find all numbers and units in the text before
-            matches = re.findall(
-                r'(\d+(?:\.\d+)?(?:\s+\d+/\d+)?|\d+/\d+)\s*(' + '|'.join(self.units) + r')?', 
-                text_before
-            )
-            
-            if matches:
-                # Get the last match (closest to ingredient)
-                quantity, unit = matches[-1]
-                if unit:
-                    return f"{quantity} {unit}"
-                else:
-                    return quantity
-        
-        return None
+    def _nearest_quantity(self, tokens: List[Tuple[int, int, str, str]], token_ends: List[int],
+                          position: int, window: int = 100) -> Optional[str]:
+        """Find the quantity token closest before position, within window characters."""
+        index = bisect.bisect_right(token_ends, position) - 1
+        if index < 0:
+            return None
+        
+        start, _, quantity, unit = tokens[index]
+        if start < position - window:
+            return None
+        
+        if unit:
+            return f"{quantity} {unit}"
+        return quantity
     
     def normalize_fraction(self, quantity: str) -> float:
         """Convert fraction string to float."""
@@ -0,0 +1,55 @@
+# src/rate_limit.py
+
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by threads and asyncio tasks.
+
+    Tokens refill at rate per second up to capacity. Each acquire takes one
+    token; callers that find the bucket empty reserve a future token and wait
+    for it, so concurrent callers are spaced out instead of all waking at once.
+    A rate of None disables limiting.
+    """
+
+    def __init__(self, rate: Optional[float], capacity: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token and return how long to wait before it may be used."""
+        if not self.rate:
+            return 0.0
+
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """Block the calling thread until a token is available."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a token is available."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+def backoff_delay(attempt: int, base: float, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter for the given zero-based retry attempt."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,41 @@
+# src/records.py
+
+from typing import Optional
+
+# Where an ingredient's quantity came from
+SOURCE_RECIPE = "recipe"    # the ingredient text itself carried a quantity
+SOURCE_STEPS = "steps"      # mined from the recipe steps
+SOURCE_WEB = "web"          # found by a web search
+SOURCE_MISSING = "missing"  # no quantity found ("to taste")
+
+# Output column holding each recipe's records as plain fields (see RecipeConverter.record_fields)
+RECORDS_COLUMN = "ingredient_records"
+
+class IngredientRecord:
+    """Compact parsed ingredient: a float quantity plus interned unit and ingredient IDs.
+
+    IDs refer to KnowledgeBase.unit_vocab and KnowledgeBase.ingredient_vocab.
+    A unit_id of None means the ingredient had no unit and a quantity of None
+    means no quantity was found. quantity_text keeps the quantity as written
+    (e.g. "1 1/2") for rendering, and text keeps a web result that could not
+    be parsed. metric_quantity and metric_unit are filled in by conversion.
+    """
+
+    __slots__ = ("quantity", "quantity_text", "unit_id", "ingredient_id", "source",
+                 "text", "metric_quantity", "metric_unit")
+
+    def __init__(self, quantity: Optional[float], unit_id: Optional[int], ingredient_id: int,
+                 source: str = SOURCE_RECIPE, quantity_text: Optional[str] = None,
+                 text: Optional[str] = None):
+        self.quantity = quantity
+        self.quantity_text = quantity_text
+        self.unit_id = unit_id
+        self.ingredient_id = ingredient_id
+        self.source = source
+        self.text = text
+        self.metric_quantity: Optional[float] = None
+        self.metric_unit: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return (f"IngredientRecord({self.quantity!r}, {self.unit_id!r}, {self.ingredient_id!r}, "
+                f"source={self.source!r})")
@@ -0,0 +1,147 @@
+# src/search_cache.py
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# Returned by get() when a key has no usable entry, so that cached None values
+# (negative entries) can be told apart from cache misses
+MISSING = object()
+
+class SearchCache:
+    """Bounded LRU cache for search results with per-entry TTL and negative entries.
+
+    Negative entries record that a lookup found nothing. They are returned as
+    None and expire after negative_ttl, which is normally much shorter than the
+    TTL of positive entries so that failed lookups are retried eventually.
+    """
+
+    def __init__(self, max_entries: Optional[int] = 100000, ttl: Optional[float] = None,
+                 negative_ttl: Optional[float] = 24 * 3600, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+
+        # key -> (value, expires_at, negative); ordered from least to most recently used
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str, default: Any = MISSING) -> Any:
+        """Return the cached value for key (None for negative entries), or default."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at, negative = entry
+        if expires_at is not None and expires_at <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        if negative:
+            self.negative_hits += 1
+            return None
+        self.hits += 1
+        return value
+
+    def peek(self, key: str, default: Any = MISSING) -> Any:
+        """Like get(), but without counting the lookup or marking the entry as used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+
+        value, expires_at, negative = entry
+        if expires_at is not None and expires_at <= self.clock():
+            return default
+        return None if negative else value
+
+    def set(self, key: str, value: Any, negative: bool = False):
+        """Store a result, or a negative entry when negative is True."""
+        ttl = self.negative_ttl if negative else self.ttl
+        expires_at = self.clock() + ttl if ttl is not None else None
+        self._store(key, (None if negative else value, expires_at, negative))
+
+    def _store(self, key: str, entry: tuple):
+        """Insert an entry as most recently used and evict down to max_entries."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record(self, key: str) -> Optional[Dict[str, Any]]:
+        """Serializable form of a single entry, as stored in snapshots and the journal."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, negative = entry
+        return {"value": value, "expires": expires_at, "negative": negative}
+
+    def set_record(self, key: str, record: Dict[str, Any]):
+        """Store an entry given in its serialized form (see record()), unless it has expired."""
+        if record["expires"] is not None and record["expires"] <= self.clock():
+            return
+        self._store(key, (record["value"], record["expires"], bool(record["negative"])))
+    
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Serialize unexpired entries from least to most recently used."""
+        now = self.clock()
+        return {
+            key: self.record(key)
+            for key, (_, expires_at, _) in self._entries.items()
+            if expires_at is None or expires_at > now
+        }
+
+    def load(self, data: Dict[str, Any]):
+        """Load serialized entries, dropping expired ones.
+
+        Plain values written before entries carried metadata are loaded as
+        positive entries that never expire.
+        """
+        now = self.clock()
+        for key, record in data.items():
+            if isinstance(record, dict) and "value" in record and "expires" in record:
+                entry = (record["value"], record["expires"], bool(record.get("negative")))
+            else:
+                entry = (record, None, False)
+
+            if entry[1] is not None and entry[1] <= now:
+                continue
+            self._store(key, entry)
+
+        # Loading is not usage: only count evictions caused by the run itself
+        self.evictions = 0
+
+    def clear(self):
+        """Drop all entries. Counters are kept."""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss and eviction counters."""
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0
+        }
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,317 @@
+# src/sqlite_store.py
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+from .density_index import DensityIndex
+from .knowledge_base import KnowledgeBase
+
+class SQLiteKnowledgeBase(KnowledgeBase):
+    """KnowledgeBase stored in a local SQLite database.
+
+    The database runs in WAL mode so several worker processes can share one
+    knowledge base directory: readers never block the writer, writes from
+    each process are batched into short transactions, and densities added by
+    other processes are picked up when a lookup misses. Open one instance per
+    process; connections must not be shared across a fork.
+
+    The search cache follows the same rules as SearchCache (size cap with LRU
+    eviction, per-entry TTL, negative entries) but lives in the database
+    rather than in memory. Access times are written with the batched writes,
+    and eviction happens when a batch is committed.
+    """
+
+    def __init__(self, base_path="data/knowledge_base", db_name: str = "knowledge_base.sqlite3",
+                 batch_size: int = 100, timeout: float = 30.0, cache_size: Optional[int] = 100000,
+                 cache_ttl: Optional[float] = None, negative_ttl: Optional[float] = 24 * 3600,
+                 density_packs: Optional[Sequence] = None):
+        self.base_path = Path(base_path)
+        self.db_path = self.base_path / db_name
+        self.densities_path = self.base_path / "densities.json"
+        self.conversions_path = self.base_path / "conversions.json"
+        self.search_cache_path = self.base_path / "search_cache.json"
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.negative_ttl = negative_ttl
+
+        # Ensure directories exist
+        self.base_path.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._pending_densities: Dict[str, float] = {}
+        self._pending_cache: Dict[str, tuple] = {}
+        self._pending_access: Dict[str, float] = {}
+        self._cache_stats = {"hits": 0, "negative_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+        self._conn = sqlite3.connect(str(self.db_path), timeout=timeout,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+        self._create_schema()
+
+        self.conversions = json.loads(self._get_meta("conversions"))
+        self.densities = {}
+        self._pack_names = self._load_density_packs(density_packs)
+        self.density_index = DensityIndex(self.densities)
+        self._build_unit_table()
+        self._build_ingredient_table()
+        self._data_version = None
+        self._refresh_densities()
+
+    def _create_schema(self):
+        """Create tables and seed them once, importing existing JSON snapshots if present."""
+        with self._transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS densities (name TEXT PRIMARY KEY, density REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache (query TEXT PRIMARY KEY, result TEXT NOT NULL, "
+                "expires REAL, negative INTEGER NOT NULL DEFAULT 0, accessed REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(search_cache)")}
+            for column, definition in [("expires", "REAL"),
+                                       ("negative", "INTEGER NOT NULL DEFAULT 0"),
+                                       ("accessed", "REAL NOT NULL DEFAULT 0")]:
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE search_cache ADD COLUMN {column} {definition}")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS search_cache_accessed ON search_cache (accessed)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'conversions'").fetchone():
+                return
+
+            densities = self._load_json(self.densities_path, self._initial_densities())
+            conversions = self._load_json(self.conversions_path, self._initial_conversions())
+            search_cache = self._load_json(self.search_cache_path, {})
+
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO densities (name, density) VALUES (?, ?)",
+                densities.items()
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO search_cache (query, result, expires, negative) VALUES (?, ?, ?, ?)",
+                (self._cache_row(query, record) for query, record in search_cache.items())
+            )
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('conversions', ?)",
+                (json.dumps(conversions),)
+            )
+
+    def _transaction(self):
+        """Context manager for a write transaction that takes the database lock up front."""
+        return _Transaction(self._conn, self._lock)
+
+    def _load_json(self, path: Path, default_data: Dict) -> Dict:
+        """Load a JSON snapshot from the JSON backend, if one exists."""
+        if path.exists():
+            with open(path, 'r') as f:
+                return json.load(f)
+        return default_data
+
+    def _cache_row(self, query: str, record: Any) -> tuple:
+        """Convert a JSON snapshot entry (with or without cache metadata) into a table row."""
+        if isinstance(record, dict) and "value" in record and "expires" in record:
+            return query, json.dumps(record["value"]), record["expires"], int(bool(record.get("negative")))
+        return query, json.dumps(record), None, 0
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        """Read a value from the meta table."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _refresh_densities(self) -> bool:
+        """Reload densities if another connection has committed since the last load."""
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return False
+
+            self._data_version = data_version
+            for name, density in self._conn.execute("SELECT name, density FROM densities"):
+                if name not in self._pending_densities:
+                    self.densities[name] = density
+                    self.density_index.add(name)
+            self._invalidate_densities()
+        return True
+
+    def get_density_by_id(self, ingredient_id: int) -> Optional[float]:
+        """Get density for an interned ingredient ID, picking up densities added by other workers."""
+        density = super().get_density_by_id(ingredient_id)
+        if density is None and self._refresh_densities():
+            density = super().get_density_by_id(ingredient_id)
+        return density
+
+    def _record(self, table: str, key: str, value: Any):
+        """Queue a mutation for the next batched transaction."""
+        with self._lock:
+            if table == "densities":
+                self._pending_densities[key] = value
+            else:
+                self._pending_cache[key] = (json.dumps(value["value"]), value["expires"], int(value["negative"]))
+                self._pending_access[key] = time.time()
+
+            if len(self._pending_densities) + len(self._pending_cache) >= self.batch_size:
+                self.save()
+
+    def export_delta(self):
+        """Nothing to hand over: every process writes to the shared database itself."""
+        return []
+
+    def apply_delta(self, delta):
+        """Queue mutations exported by another knowledge base for the next batched transaction."""
+        with self._lock:
+            for table, key, value in delta:
+                if table == "densities":
+                    self.densities[key] = value
+                    self.density_index.add(key)
+                self._record(table, key, value)
+            self._invalidate_densities()
+
+    def _cache_record(self, result: Any, negative: bool) -> Dict[str, Any]:
+        """Build a cache entry in the same form SearchCache.record() produces."""
+        ttl = self.negative_ttl if negative else self.cache_ttl
+        return {
+            "value": None if negative else result,
+            "expires": time.time() + ttl if ttl is not None else None,
+            "negative": negative
+        }
+
+    def add_to_cache(self, query: str, result: Any):
+        """Add search result to cache."""
+        self._record("search_cache", query, self._cache_record(result, False))
+
+    def add_negative_to_cache(self, query: str):
+        """Record that a search found nothing, so it is not repeated until the entry expires."""
+        self._record("search_cache", query, self._cache_record(None, True))
+
+    def _stored_cache_row(self, query: str) -> Optional[tuple]:
+        """The (result, expires, negative) row for a query, pending or stored, or None."""
+        row = self._pending_cache.get(query)
+        if row is None:
+            row = self._conn.execute(
+                "SELECT result, expires, negative FROM search_cache WHERE query = ?", (query,)
+            ).fetchone()
+        return row
+
+    def get_from_cache(self, query: str, default: Any = None) -> Optional[Any]:
+        """Get search result from cache (None for negative entries), or default."""
+        with self._lock:
+            row = self._stored_cache_row(query)
+            if row is None:
+                self._cache_stats["misses"] += 1
+                return default
+
+            result, expires, negative = row
+            if expires is not None and expires <= time.time():
+                self._cache_stats["expirations"] += 1
+                self._cache_stats["misses"] += 1
+                return default
+
+            self._pending_access[query] = time.time()
+            if negative:
+                self._cache_stats["negative_hits"] += 1
+                return None
+            self._cache_stats["hits"] += 1
+            return json.loads(result)
+
+    def peek_cache(self, query: str, default: Any = None) -> Optional[Any]:
+        """Like get_from_cache(), but not counted in cache_stats(), for re-checks after a counted miss."""
+        with self._lock:
+            row = self._stored_cache_row(query)
+            if row is None:
+                return default
+            result, expires, negative = row
+            if expires is not None and expires <= time.time():
+                return default
+            return None if negative else json.loads(result)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit, miss and eviction counters for the search cache of this process."""
+        with self._lock:
+            stats = dict(self._cache_stats)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        lookups = stats["hits"] + stats["negative_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["negative_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def save(self):
+        """Write all queued mutations in a single transaction."""
+        with self._lock:
+            if not self._pending_densities and not self._pending_cache and not self._pending_access:
+                return
+
+            with self._transaction():
+                self._conn.executemany(
+                    "INSERT INTO densities (name, density) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET density = excluded.density",
+                    self._pending_densities.items()
+                )
+                self._conn.executemany(
+                    "INSERT INTO search_cache (query, result, expires, negative) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(query) DO UPDATE SET result = excluded.result, "
+                    "expires = excluded.expires, negative = excluded.negative",
+                    ((query,) + row for query, row in self._pending_cache.items())
+                )
+                self._conn.executemany(
+                    "UPDATE search_cache SET accessed = MAX(accessed, ?) WHERE query = ?",
+                    ((accessed, query) for query, accessed in self._pending_access.items())
+                )
+                self._evict()
+
+            self._pending_densities.clear()
+            self._pending_cache.clear()
+            self._pending_access.clear()
+
+    def flush(self):
+        """Commit queued mutations; a batched transaction is already cheap and durable."""
+        self.save()
+
+    def _evict(self):
+        """Drop expired cache entries, then the least recently used ones above cache_size."""
+        self._conn.execute("DELETE FROM search_cache WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+        if self.cache_size is None:
+            return
+
+        excess = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0] - self.cache_size
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM search_cache WHERE query IN "
+                "(SELECT query FROM search_cache ORDER BY accessed LIMIT ?)",
+                (excess,)
+            )
+            self._cache_stats["evictions"] += excess
+
+    def close(self):
+        """Flush queued mutations and close the database connection."""
+        self.save()
+        self._conn.close()
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK around a block, holding the instance lock."""
+
+    def __init__(self, conn: sqlite3.Connection, lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        finally:
+            self.lock.release()
+        return False
@@ -0,0 +1,102 @@
+# src/units.py
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Unit kinds
+UNIT_UNKNOWN = 0
+UNIT_VOLUME = 1
+UNIT_WEIGHT = 2
+UNIT_COUNT = 3
+
+# A quantity as written in recipes: "2", "1.5", "1/2" or "1 1/2"
+# (fractions are tried before the bare leading number, so "1/2" isn't read as "1")
+QUANTITY = r'(\d+(?:/\d+|(?:\.\d+)?(?:\s+\d+/\d+)?))'
+
+class UnitRegistry:
+    """Measurement units with their aliases, kinds and metric factors.
+
+    Factors are in ml for volume units and g for weight units. The compiled
+    patterns are built once; unit alternations are ordered longest-first and
+    must end on a word boundary, so "g" can't shadow "gram" and "l" can't
+    match the start of "large".
+    """
+
+    def __init__(self, units: Dict[str, Tuple[int, float, List[str]]]):
+        self.kinds: Dict[str, int] = {}
+        self.factors: Dict[str, float] = {}
+        self._canonical: Dict[str, str] = {}
+
+        for canonical, (kind, factor, aliases) in units.items():
+            self.kinds[canonical] = kind
+            self.factors[canonical] = factor
+            for spelling in [canonical] + aliases:
+                self._canonical[spelling] = canonical
+
+        # Every spelling, longest first
+        self.spellings = sorted(self._canonical, key=lambda unit: (-len(unit), unit))
+        alternation = '|'.join(re.escape(unit) for unit in self.spellings)
+
+        # A unit spelling that isn't followed by more letters
+        self.unit_pattern = r'(?:' + alternation + r')(?![a-z])'
+
+        # "<quantity> [unit] [of] <name>" for a whole ingredient string
+        self.quantity_pattern = re.compile(
+            r'^' + QUANTITY + r'\s*(' + self.unit_pattern + r')?\s+(?:of\s+)?(.+)$',
+            re.IGNORECASE
+        )
+
+        # Same, but allowed to start anywhere in a text
+        self.measurement_pattern = re.compile(
+            QUANTITY + r'\s*(' + self.unit_pattern + r')?\s+(?:of\s+)?(.+)',
+            re.IGNORECASE
+        )
+
+        # A bare "<quantity> [unit]" token inside running text
+        self.quantity_token_pattern = re.compile(
+            QUANTITY + r'\s*(' + self.unit_pattern + r')?',
+            re.IGNORECASE
+        )
+
+    def canonical(self, unit: str) -> Optional[str]:
+        """Canonical name of a unit spelling, or None if it isn't a known unit."""
+        return self._canonical.get(unit.lower().strip())
+
+    def kind(self, unit: str) -> int:
+        """Kind of a unit spelling (UNIT_UNKNOWN if it isn't a known unit)."""
+        canonical = self.canonical(unit)
+        return self.kinds[canonical] if canonical else UNIT_UNKNOWN
+
+    def factor(self, unit: str) -> Optional[float]:
+        """Metric factor (ml or g) of a unit spelling, or None if it has none."""
+        canonical = self.canonical(unit)
+        return self.factors[canonical] if canonical else None
+
+UNITS = UnitRegistry({
+    # Volume (ml)
+    "cup": (UNIT_VOLUME, 240, ["cups"]),
+    "tablespoon": (UNIT_VOLUME, 15, ["tablespoons", "tbsp", "tbsps", "tbs"]),
+    "teaspoon": (UNIT_VOLUME, 5, ["teaspoons", "tsp", "tsps"]),
+    "fluid ounce": (UNIT_VOLUME, 30, ["fluid ounces", "fl oz"]),
+    "pint": (UNIT_VOLUME, 473, ["pints"]),
+    "quart": (UNIT_VOLUME, 946, ["quarts", "qt"]),
+    "gallon": (UNIT_VOLUME, 3785, ["gallons", "gal"]),
+    "milliliter": (UNIT_VOLUME, 1, ["milliliters", "ml"]),
+    "liter": (UNIT_VOLUME, 1000, ["liters", "l"]),
+    # Weight (g)
+    "pound": (UNIT_WEIGHT, 453.592, ["pounds", "lb", "lbs"]),
+    "ounce": (UNIT_WEIGHT, 28.35, ["ounces", "oz"]),
+    "gram": (UNIT_WEIGHT, 1, ["grams", "g"]),
+    "kilogram": (UNIT_WEIGHT, 1000, ["kilograms", "kg"]),
+    # Count
+    "piece": (UNIT_COUNT, 1, ["pieces"]),
+    "slice": (UNIT_COUNT, 1, ["slices"]),
+    "whole": (UNIT_COUNT, 1, []),
+    "clove": (UNIT_COUNT, 1, ["cloves"]),
+    "pinch": (UNIT_COUNT, 1, ["pinches"]),
+    "dash": (UNIT_COUNT, 1, ["dashes"]),
+    "bunch": (UNIT_COUNT, 1, ["bunches"]),
+    "can": (UNIT_COUNT, 1, ["cans"]),
+    "package": (UNIT_COUNT, 1, ["packages", "pkg"]),
+    "jar": (UNIT_COUNT, 1, ["jars"]),
+})
@@ -0,0 +1,71 @@
+# src/vocabulary.py
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+class Vocabulary:
+    """Interned vocabulary mapping canonical names to small integer IDs.
+
+    Names are normalized once, the first time a raw string is seen; later
+    lookups of the same raw string are a single dict access. IDs are dense
+    (0..len-1), so per-name data can live in flat arrays indexed by ID.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        # Raw spellings seen so far, mapped straight to their canonical ID
+        self._raw_ids: Dict[str, int] = {}
+
+        for name in names:
+            self.intern(name)
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        """Canonical form of a name: lowercase with collapsed whitespace."""
+        return " ".join(name.lower().split())
+
+    def intern(self, name: str) -> int:
+        """Return the ID for a name, assigning a new one if it hasn't been seen."""
+        id_ = self._raw_ids.get(name)
+        if id_ is not None:
+            return id_
+
+        canonical = self.normalize(name)
+        id_ = self._ids.get(canonical)
+        if id_ is None:
+            id_ = len(self._names)
+            self._ids[canonical] = id_
+            self._names.append(canonical)
+
+        self._raw_ids[name] = id_
+        return id_
+
+    def get(self, name: str) -> Optional[int]:
+        """Return the ID for a name without interning it."""
+        id_ = self._raw_ids.get(name)
+        if id_ is None:
+            id_ = self._ids.get(self.normalize(name))
+        return id_
+
+    def name(self, id_: int) -> str:
+        """Canonical name for an ID."""
+        return self._names[id_]
+
+    @property
+    def names(self) -> List[str]:
+        """Canonical names in ID order."""
+        return self._names
+
+    def encode(self, names: Sequence[str]) -> np.ndarray:
+        """Intern a column of names, normalizing each distinct value once."""
+        uniques, inverse = np.unique(np.asarray(names, dtype=object).astype(str), return_inverse=True)
+        ids = np.array([self.intern(name) for name in uniques], dtype=np.int32)
+        return ids[inverse.reshape(-1)]
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def __len__(self) -> int:
+        return len(self._names)
@@ -1,145 +1,302 @@
 # src/web_search.py
 
 import re
+import threading
 import time
-from typing import Dict, Any, Optional, List, Tuple
-from duckduckgo_search import DDGS
-from bs4 import BeautifulSoup
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional, List
+
+from .backends import LiveBackend
+from .html_text import get_extractor
+from .page_cache import PageCache
+from .rate_limit import TokenBucket, backoff_delay
+from .search_cache import MISSING
+from .single_flight import SingleFlight
+from .units import UNITS
+
+# Ways pages state a density in grams per cup, as one alternation so the text is scanned once
+DENSITY_PATTERN = re.compile('|'.join([
+    r'(\d+(?:\.\d+)?)\s*g(?:rams)?\s*per\s*cup',
+    r'(\d+(?:\.\d+)?)\s*g(?:rams)?\s*/\s*cup',
+    r'cup\s*of\s*[^.]*?weighs\s*(\d+(?:\.\d+)?)\s*g(?:rams)?',
+    r'density\s*of\s*[^.]*?is\s*(\d+(?:\.\d+)?)\s*g(?:rams)?\s*per\s*cup'
+]), re.IGNORECASE)
 
 class WebSearchManager:
-    def __init__(self, knowledge_base, max_retries=3, delay=2):
+    def __init__(self, knowledge_base, max_retries=3, delay=2, burst=1,
+                 fetch_workers=5, page_cache=None, html_backend=None, backend=None):
         self.knowledge_base = knowledge_base
         self.max_retries = max_retries
         self.delay = delay
-        self.ddgs = DDGS()
+        
+        # Where searches and page fetches go: live, recording or replaying fixtures
+        self.backend = backend if backend is not None else LiveBackend(pool_size=max(fetch_workers, 10))
+        
+        # One query per delay seconds on average, shared by every caller
+        self.rate_limiter = TokenBucket(1.0 / delay if delay else None, burst)
+        
+        # In-flight searches, keyed by cache key
+        self._flights = SingleFlight()
+        
+        # Result pages are fetched concurrently
+        self.extract_text = get_extractor(html_backend)
+        self._fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="page-fetch")
+        
+        # Extracted page text is kept on disk next to the knowledge base (page_cache=False disables it)
+        if page_cache is None and knowledge_base is not None:
+            page_cache = PageCache(knowledge_base.base_path / "pages")
+        self.page_cache = page_cache if page_cache is not False else None
     
     def search_ingredient_density(self, ingredient: str) -> Optional[float]:
         """Search for ingredient density online."""
         # Check cache first
-        cache_key = f"density_{ingredient}"
-        cached = self.knowledge_base.get_from_cache(cache_key)
-        if cached is not None:
+        cache_key = self.density_cache_key(ingredient)
+        cached = self.cached_result(cache_key)
+        if cached is not MISSING:
+            return cached
+        
+        # Concurrent callers for the same ingredient share one search
+        return self._flights.do(cache_key, self._search_density, ingredient)
+    
+    def _search_density(self, ingredient: str) -> Optional[float]:
+        # A search for this ingredient may have finished since the caller checked the cache
+        cached = self.cached_result(self.density_cache_key(ingredient), recheck=True)
+        if cached is not MISSING:
+            return cached
+        
+        return self.density_from_results(ingredient, self.search_with_retry(self.density_query(ingredient)))
+    
+    def search_ingredient_quantity(self, recipe_name: str, ingredient: str) -> Optional[str]:
+        """Search for standard quantity of an ingredient in a recipe."""
+        # Check cache first
+        cache_key = self.quantity_cache_key(recipe_name, ingredient)
+        cached = self.cached_result(cache_key)
+        if cached is not MISSING:
+            return cached
+        
+        # Concurrent callers for the same lookup share one search
+        return self._flights.do(cache_key, self._search_quantity, recipe_name, ingredient)
+    
+    def _search_quantity(self, recipe_name: str, ingredient: str) -> Optional[str]:
+        # A search for this lookup may have finished since the caller checked the cache
+        cached = self.cached_result(self.quantity_cache_key(recipe_name, ingredient), recheck=True)
+        if cached is not MISSING:
             return cached
         
-        # Perform search
-        query = f"{ingredient} density grams per cup cooking"
+        results = self.search_with_retry(self.quantity_query(recipe_name, ingredient))
+        return self.quantity_from_results(recipe_name, ingredient, results)
+    
+    def cached_result(self, cache_key: str, recheck: bool = False) -> Any:
+        """Cached answer of a lookup (None for a negative entry), or MISSING.
+        
+        With recheck the cache is peeked without counting the lookup, for the
+        second check inside a single-flight search whose caller already
+        counted the miss.
+        """
+        if recheck:
+            return self.knowledge_base.peek_cache(cache_key, MISSING)
+        return self.knowledge_base.get_from_cache(cache_key, MISSING)
+    
+    def density_from_results(self, ingredient: str, results: Optional[List[Dict[str, Any]]]) -> Optional[float]:
+        """Extract the density from the results of a density search and store the outcome.
+        
+        results is None when the search itself failed, which is not remembered
+        as a miss. Extraction may fetch pages.
+        """
+        if results is None:
+            return None
         
         try:
-            results = self.search_with_retry(query)
-            
             if not results:
-                return None
-            
-            # Extract density from search results
+                return self.store_density(ingredient, None)
             density = self._extract_density_from_results(results, ingredient)
-            
-            if density:
-                # Add to cache and knowledge base
-                self.knowledge_base.add_to_cache(cache_key, density)
-                self.knowledge_base.add_density(ingredient, density)
-                return density
-                
+            return self.store_density(ingredient, density, self.category_density(ingredient))
         except Exception as e:
             print(f"Error searching for {ingredient} density: {e}")
         
         return None
     
-    def search_ingredient_quantity(self, recipe_name: str, ingredient: str) -> Optional[str]:
-        """Search for standard quantity of an ingredient in a recipe."""
-        # Check cache first
-        cache_key = f"quantity_{recipe_name}_{ingredient}"
-        cached = self.knowledge_base.get_from_cache(cache_key)
-        if cached is not None:
-            return cached
+    def quantity_from_results(self, recipe_name: str, ingredient: str,
+                              results: Optional[List[Dict[str, Any]]]) -> Optional[str]:
+        """Extract the quantity from the results of a quantity search and store the outcome.
         
-        # Perform search
-        query = f"{recipe_name} recipe {ingredient} how much"
+        results is None when the search itself failed, which is not remembered
+        as a miss. Extraction may fetch pages.
+        """
+        if results is None:
+            return None
         
         try:
-            results = self.search_with_retry(query)
-            
-            if not results:
-                return None
-            
-            # Extract quantity from search results
-            quantity = self._extract_quantity_from_results(results, ingredient)
-            
-            if quantity:
-                # Add to cache
-                self.knowledge_base.add_to_cache(cache_key, quantity)
-                return quantity
-                
+            quantity = self._extract_quantity_from_results(results, ingredient) if results else None
+            return self.store_quantity(recipe_name, ingredient, quantity)
         except Exception as e:
             print(f"Error searching for {ingredient} quantity in {recipe_name}: {e}")
         
         return None
     
-    def search_with_retry(self, query: str) -> List[Dict[str, Any]]:
-        """Perform search with retry logic."""
+    def density_cache_key(self, ingredient: str) -> str:
+        """Cache key for an ingredient's density."""
+        return f"density_{ingredient}"
+    
+    def density_query(self, ingredient: str) -> str:
+        """Search query for an ingredient's density."""
+        return f"{ingredient} density grams per cup cooking"
+    
+    def quantity_cache_key(self, recipe_name: str, ingredient: str) -> str:
+        """Cache key for an ingredient's quantity in a recipe."""
+        return f"quantity_{recipe_name}_{ingredient}"
+    
+    def quantity_query(self, recipe_name: str, ingredient: str) -> str:
+        """Search query for an ingredient's quantity in a recipe."""
+        return f"{recipe_name} recipe {ingredient} how much"
+    
+    def store_density(self, ingredient: str, density: Optional[float],
+                      guess: Optional[float] = None) -> Optional[float]:
+        """Record the outcome of a density search in the cache and knowledge base.
+        
+        density is what the search found. Without one, guess (a category
+        density) is cached as the answer but not added to the knowledge base's
+        densities, which are harvested into density packs as measured values.
+        """
+        if density:
+            # Add to cache and knowledge base
+            self.knowledge_base.add_to_cache(self.density_cache_key(ingredient), density)
+            self.knowledge_base.add_density(ingredient, density)
+            return density
+        
+        if guess:
+            self.knowledge_base.add_to_cache(self.density_cache_key(ingredient), guess)
+            return guess
+        
+        self.knowledge_base.add_negative_to_cache(self.density_cache_key(ingredient))
+        return None
+    
+    def store_quantity(self, recipe_name: str, ingredient: str, quantity: Optional[str]) -> Optional[str]:
+        """Record the outcome of a quantity search in the cache."""
+        if quantity:
+            # Add to cache
+            self.knowledge_base.add_to_cache(self.quantity_cache_key(recipe_name, ingredient), quantity)
+            return quantity
+        
+        self.knowledge_base.add_negative_to_cache(self.quantity_cache_key(recipe_name, ingredient))
+        return None
+    
+    def search_with_retry(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """Perform search with retry logic. Returns None if every attempt failed."""
         for attempt in range(self.max_retries):
+            # Be nice to the search engine
+            self.rate_limiter.acquire()
             try:
-                results = list(self.ddgs.text(query, max_results=5))
-                time.sleep(self.delay)  # Be nice to the search engine
-                return results
+                return self.search_once(query)
             except Exception as e:
                 print(f"Search attempt {attempt+1} failed: {e}")
-                time.sleep(self.delay * (attempt + 1))  # Exponential backoff
+                time.sleep(backoff_delay(attempt, self.delay))  # Exponential backoff
+        
+        return None
+    
+    def search_once(self, query: str) -> List[Dict[str, Any]]:
+        """Run a single search query. Safe to call from several threads at once."""
+        return self.backend.search(query)
+    
+    def fetch_page_text(self, url: str, cancelled: Optional[threading.Event] = None) -> Optional[str]:
+        """Extracted text of a page, from the page cache when possible.
+        
+        Fresh cache entries are used without a request. Stale ones are
+        revalidated with If-None-Match/If-Modified-Since and reused on 304.
+        """
+        cached = self.page_cache.get(url) if self.page_cache is not None else None
+        if cached is not None and cached["fresh"]:
+            return cached["text"]
+        
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers['If-None-Match'] = cached["etag"]
+            if cached["last_modified"]:
+                headers['If-Modified-Since'] = cached["last_modified"]
         
-        return []
+        page = self.backend.fetch(url, headers, cancelled)
+        if page is None:
+            return None
+        
+        if page.status == 304 and cached is not None:
+            self.page_cache.revalidated(url)
+            return cached["text"]
+        if page.status != 200:
+            return None
+        
+        try:
+            text = self.extract_text(page.text())
+        except Exception:
+            return None
+        if self.page_cache is not None:
+            self.page_cache.put(url, text, page.etag, page.last_modified)
+        return text
+    
+    def _first_page_match(self, results: List[Dict[str, Any]], extract: Callable[[str], Any]) -> Any:
+        """Fetch every result page concurrently and return the first match in result order.
+        
+        Pages are checked in the order of the results, so the answer is the same
+        as when fetching them one by one. Once a page matches, fetches that
+        haven't started are cancelled and running ones stop reading.
+        """
+        urls = [result.get('href') for result in results if result.get('href')]
+        if not urls:
+            return None
+        
+        cancelled = threading.Event()
+        futures = [self._fetch_pool.submit(self.fetch_page_text, url, cancelled) for url in urls]
+        try:
+            for future in futures:
+                text = future.result()
+                if not text:
+                    continue
+                try:
+                    match = extract(text)
+                except Exception:
+                    continue
+                if match is not None:
+                    return match
+        finally:
+            cancelled.set()
+            for future in futures:
+                future.cancel()
+        
+        return None
+    
+    def _first_match(self, results: List[Dict[str, Any]], find_in_result: Callable[[Dict[str, Any]], Any],
+                     extract: Callable[[str], Any]) -> Any:
+        """First match in the order a sequential scan checks it: a result's snippet, then its page.
+        
+        Snippets cost nothing, so they are all checked first. Only the pages of
+        results before the first matching snippet can come earlier in that order,
+        so only those are fetched.
+        """
+        for index, result in enumerate(results):
+            match = find_in_result(result)
+            if match is not None:
+                page_match = self._first_page_match(results[:index], extract)
+                return page_match if page_match is not None else match
+        
+        return self._first_page_match(results, extract)
     
     def _extract_density_from_results(self, results: List[Dict[str, Any]], ingredient: str) -> Optional[float]:
         """Extract density information from search results."""
-        # Patterns to search for
-        patterns = [
-            r'(\d+(?:\.\d+)?)\s*g(?:rams)?\s*per\s*cup',
-            r'(\d+(?:\.\d+)?)\s*g(?:rams)?\s*/\s*cup',
-            r'cup\s*of\s*[^.]*?weighs\s*(\d+(?:\.\d+)?)\s*g(?:rams)?',
-            r'density\s*of\s*[^.]*?is\s*(\d+(?:\.\d+)?)\s*g(?:rams)?\s*per\s*cup'
-        ]
-        
-        for result in results:
-            # Try to extract from snippet
-            text = result.get('body', '')
-            for pattern in patterns:
-                matches = re.search(pattern, text, re.IGNORECASE)
-                if matches:
-                    try:
-                        return float(matches.group(1))
-                    except ValueError:
-                        continue
-            
-            # Try to extract from title
-            text = result.get('title', '')
-            for pattern in patterns:
-                matches = re.search(pattern, text, re.IGNORECASE)
-                if matches:
-                    try:
-                        return float(matches.group(1))
-                    except ValueError:
-                        continue
-                        
-            # Try to visit the page for more detailed extraction
-            try:
-                url = result.get('href')
-                if url:
-                    response = requests.get(url, timeout=10)
-                    if response.status_code == 200:
-                        soup = BeautifulSoup(response.text, 'html.parser')
-                        text = soup.get_text()
-                        
-                        # Look for density patterns
-                        for pattern in patterns:
-                            matches = re.search(pattern, text, re.IGNORECASE)
-                            if matches:
-                                try:
-                                    return float(matches.group(1))
-                                except ValueError:
-                                    continue
-            except:
-                continue
-        
-        # Default densities for common ingredient categories
+        def find_density(text: str) -> Optional[float]:
+            matches = DENSITY_PATTERN.search(text)
+            if matches:
+                return float(next(group for group in matches.groups() if group is not None))
+            return None
+        
+        def find_in_result(result: Dict[str, Any]) -> Optional[float]:
+            density = find_density(result.get('body', ''))
+            return density if density is not None else find_density(result.get('title', ''))
+        
+        # Snippet and title, then the page for more detailed extraction, result by result
+        return self._first_match(results, find_in_result, find_density)
+    
+    def category_density(self, ingredient: str) -> Optional[float]:
+        """Typical density for an ingredient's category (g/cup), a guess for when searches find none."""
         if any(word in ingredient.lower() for word in ['flour', 'powder']):
             return 120.0  # Default flour density
         elif any(word in ingredient.lower() for word in ['sugar', 'sweetener']):
@@ -152,31 +309,34 @@ class WebSearchManager:
     def _extract_quantity_from_results(self, results: List[Dict[str, Any]], ingredient: str) -> Optional[str]:
         """Extract quantity information from search results."""
         # Pattern for ingredient quantities
-        pattern = r'(\d+(?:\.\d+)?)\s*(?:cup|tablespoon|tbsp|teaspoon|tsp|oz|ounce|lb|pound|g|gram)s?\s+(?:of\s+)?[^,.]*?' + re.escape(ingredient)
+        pattern = re.compile(
+            r'(\d+(?:\.\d+)?)\s*' + UNITS.unit_pattern + r'\s+(?:of\s+)?[^,.]*?' + re.escape(ingredient),
+            re.IGNORECASE
+        )
         
-        for result in results:
-            # Try to extract from snippet
-            text = result.get('body', '')
-            matches = re.search(pattern, text, re.IGNORECASE)
-            if matches:
-                return matches.group(0)
-                
-            # Try to visit the page for more detailed extraction
-            try:
-                url = result.get('href')
-                if url:
-                    response = requests.get(url, timeout=10)
-                    if response.status_code == 200:
-                        soup = BeautifulSoup(response.text, 'html.parser')
-                        ingredient_sections = soup.find_all(['li', 'p'])
-                        
-                        for section in ingredient_sections:
-                            text = section.get_text()
-                            if ingredient.lower() in text.lower():
-                                matches = re.search(pattern, text, re.IGNORECASE)
-                                if matches:
-                                    return matches.group(0)
-            except:
-                continue
-                
-        return None
\ No newline at end of file
+        def find_in_result(result: Dict[str, Any]) -> Optional[str]:
+            matches = pattern.search(result.get('body', ''))
+            return matches.group(0) if matches else None
+        
+        def find_quantity(text: str) -> Optional[str]:
+            # Page text has one line per list item or paragraph
+            for line in text.split('\n'):
+                if ingredient.lower() in line.lower():
+                    matches = pattern.search(line)
+                    if matches:
+                        return matches.group(0)
+            return None
+        
+        # Snippet, then the page for more detailed extraction, result by result
+        return self._first_match(results, find_in_result, find_quantity)
+    
+    def save(self):
+        """Write the page cache index to disk."""
+        if self.page_cache is not None:
+            self.page_cache.save()
+    
+    def close(self):
+        """Stop the page fetch workers, close the backend and save the page cache."""
+        self._fetch_pool.shutdown(wait=False, cancel_futures=True)
+        self.backend.close()
+        self.save()
@@ -0,0 +1,50 @@
+# tests/test_async_search.py
+
+import asyncio
+import threading
+import time
+
+from src.async_search import AsyncWebSearchManager
+from src.knowledge_base import KnowledgeBase
+from src.web_search import WebSearchManager
+
+class SlowBackend:
+    """Answers every density query after a pause, tracking how many searches overlap."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most_running = 0
+
+    def search(self, query):
+        with self.lock:
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        return [{"href": "", "title": "", "body": "a cup of it weighs 150 grams"}]
+
+    def fetch(self, *args):
+        return None
+
+    def close(self):
+        pass
+
+def test_direct_callers_share_the_concurrency_limit(tmp_path):
+    backend = SlowBackend()
+    web_search = WebSearchManager(KnowledgeBase(tmp_path, density_packs=[]), delay=0, backend=backend,
+                                  page_cache=False)
+    async_search = AsyncWebSearchManager(web_search, max_concurrency=2)
+
+    async def lookups():
+        return await asyncio.gather(*(async_search.search_ingredient_density(ingredient)
+                                      for ingredient in ["oats", "rice", "lentils", "barley", "millet"]))
+
+    try:
+        assert async_search.run(lookups()) == [150.0] * 5
+    finally:
+        async_search.close()
+        web_search.close()
+
+    assert backend.most_running == 2
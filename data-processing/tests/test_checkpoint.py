@@ -0,0 +1,35 @@
+# tests/test_checkpoint.py
+
+import pandas as pd
+import pytest
+
+from src.checkpoint import CheckpointedOutput
+
+def write_partial_run(tmp_path, settings):
+    output = CheckpointedOutput(tmp_path / "out.csv", "in.csv", settings)
+    output.open()
+    output.append(pd.DataFrame({"name": ["a"], "steps": ["x"]}))
+    output.checkpoint()
+
+def test_resume_with_same_settings(tmp_path):
+    write_partial_run(tmp_path, {"keep_columns": None})
+
+    output = CheckpointedOutput(tmp_path / "out.csv", "in.csv", {"keep_columns": None})
+    assert output.open(resume=True) == 1
+    output.append(pd.DataFrame({"name": ["b"], "steps": ["y"]}))
+    assert pd.read_csv(tmp_path / "out.csv")["name"].tolist() == ["a", "b"]
+
+def test_resume_with_other_settings_is_refused(tmp_path):
+    write_partial_run(tmp_path, {"keep_columns": None})
+
+    output = CheckpointedOutput(tmp_path / "out.csv", "in.csv", {"keep_columns": ["tags"]})
+    assert output.open(resume=True) is None
+
+def test_rows_with_other_columns_are_refused(tmp_path):
+    write_partial_run(tmp_path, {})
+
+    output = CheckpointedOutput(tmp_path / "out.csv", "in.csv", {})
+    output.open(resume=True)
+    with pytest.raises(ValueError):
+        output.append(pd.DataFrame({"name": ["b"], "tags": ["t"], "steps": ["y"]}))
+    assert pd.read_csv(tmp_path / "out.csv").columns.tolist() == ["name", "steps"]
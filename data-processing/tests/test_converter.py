@@ -0,0 +1,83 @@
+# tests/test_converter.py
+
+from src.async_search import AsyncWebSearchManager
+from src.converter import RecipeConverter
+from src.knowledge_base import KnowledgeBase
+from src.web_search import WebSearchManager
+
+def test_memo_survives_density_changes(tmp_path):
+    knowledge_base = KnowledgeBase(tmp_path, density_packs=[])
+    converter = RecipeConverter(knowledge_base, None)
+    recipe = {'name': 'bread', 'ingredients_list': ['2 cups flour', '500 g water'], 'steps': []}
+
+    first = [(record.metric_quantity, record.metric_unit) for record in converter.build_ingredient_records(recipe)]
+    knowledge_base.add_density("rye flour", 100.0)
+    second = [(record.metric_quantity, record.metric_unit) for record in converter.build_ingredient_records(recipe)]
+
+    assert first == second == [(0.48, 'L'), (500.0, 'g')]
+    assert converter.memo_stats()["hits"] == 2
+
+class QuantityBackend:
+    """Finds two cups of any ingredient, counting searches."""
+
+    def __init__(self):
+        self.searches = 0
+
+    def search(self, query):
+        self.searches += 1
+        ingredient = query.split(' recipe ')[1].replace(' how much', '')
+        return [{"href": "", "title": "", "body": f"use 2 cups {ingredient} here"}]
+
+    def fetch(self, *args):
+        return None
+
+    def close(self):
+        pass
+
+def test_prefetched_records_are_built_once(tmp_path):
+    knowledge_base = KnowledgeBase(tmp_path, density_packs=[])
+    backend = QuantityBackend()
+    web_search = WebSearchManager(knowledge_base, delay=0, backend=backend, page_cache=False)
+    async_search = AsyncWebSearchManager(web_search, 2)
+    converter = RecipeConverter(knowledge_base, web_search)
+
+    builds = []
+    build = converter.build_ingredient_records
+    converter.build_ingredient_records = lambda recipe: builds.append(recipe['name']) or build(recipe)
+
+    recipes = [{'name': 'porridge', 'ingredients_list': ['oats', '1 cup milk'], 'steps': []},
+               ValueError("no name")]
+    try:
+        records = async_search.run(converter.prefetch_batch(recipes, async_search))
+        columns = converter.convert_batch(recipes, [0, 1], records)
+    finally:
+        async_search.close()
+        web_search.close()
+
+    assert builds == ['porridge']
+    assert backend.searches == 1
+    assert columns['standard_ingredients'][0] == '["2 cups oats", "1 cup milk"]'
+    assert columns['standard_ingredients'][1] == "[]"
+
+class FailingBackend(QuantityBackend):
+    def search(self, query):
+        self.searches += 1
+        raise ConnectionError("search engine down")
+
+def test_failed_prefetch_lookups_are_not_searched_again(tmp_path):
+    knowledge_base = KnowledgeBase(tmp_path, density_packs=[])
+    backend = FailingBackend()
+    web_search = WebSearchManager(knowledge_base, max_retries=2, delay=0, backend=backend, page_cache=False)
+    async_search = AsyncWebSearchManager(web_search, 2)
+    converter = RecipeConverter(knowledge_base, web_search)
+
+    recipes = [{'name': 'porridge', 'ingredients_list': ['oats', '1 cup milk'], 'steps': []}]
+    try:
+        records = async_search.run(converter.prefetch_batch(recipes, async_search))
+        columns = converter.convert_batch(recipes, [0], records)
+    finally:
+        async_search.close()
+        web_search.close()
+
+    assert backend.searches == 2
+    assert columns['standard_ingredients'][0] == '["oats to taste", "1 cup milk"]'
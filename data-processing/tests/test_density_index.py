@@ -0,0 +1,40 @@
+# tests/test_density_index.py
+
+from src.density_index import DensityIndex
+from src.knowledge_base import KnowledgeBase
+
+def test_longest_contained_key_wins():
+    index = DensityIndex(["flour", "rice flour", "rice", "sugar"])
+
+    assert index.lookup("brown rice flour") == "rice flour"
+    assert index.lookup("basmati rice") == "rice"
+    assert index.lookup("salt") is None
+
+def test_ties_are_broken_alphabetically():
+    index = DensityIndex(["milk", "salt"])
+    assert index.lookup("salt and milk") == "milk"
+
+def test_short_queries_fall_back_to_the_shortest_containing_key():
+    index = DensityIndex(["brown sugar", "powdered sugar", "oats"])
+
+    assert index.longest_contained("sug") is None
+    assert index.lookup("sug") == "brown sugar"
+    assert index.lookup("oat") == "oats"
+    assert index.lookup("ts") == "oats"
+    assert index.lookup("xyz") is None
+
+def test_added_keys_are_found():
+    index = DensityIndex(["water"])
+    assert index.lookup("watermelon") == "water"
+    index.add("watermelon")
+    index.add("watermelon")
+    assert index.lookup("watermelon juice") == "watermelon"
+
+def test_add_density_invalidates_resolved_partial_matches(tmp_path):
+    knowledge_base = KnowledgeBase(tmp_path, density_packs=[])
+    knowledge_base.add_density("zorbleberry", 160.0)
+    assert knowledge_base.get_density("candied zorbleberry bits") == 160.0
+
+    knowledge_base.add_density("candied zorbleberry", 170.0)
+    assert knowledge_base.get_density("candied zorbleberry bits") == 170.0
+    assert knowledge_base.get_density("zorbleberry") == 160.0
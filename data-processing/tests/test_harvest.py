@@ -0,0 +1,66 @@
+# tests/test_harvest.py
+
+from collections import Counter
+
+from src.async_search import AsyncWebSearchManager
+from src.harvest import harvest_densities
+from src.knowledge_base import KnowledgeBase
+from src.web_search import WebSearchManager
+
+class StubAsyncSearch:
+    """Finds a density for the listed ingredients only, like a search would."""
+
+    def __init__(self, knowledge_base, found):
+        self.knowledge_base = knowledge_base
+        self.found = found
+        self.searched = []
+
+    async def resolve_densities(self, ingredients):
+        for ingredient in ingredients:
+            self.searched.append(ingredient)
+            if ingredient in self.found:
+                self.knowledge_base.add_density(ingredient, self.found[ingredient])
+
+def test_partial_matches_are_searched_not_packed(tmp_path):
+    knowledge_base = KnowledgeBase(tmp_path, density_packs=[])
+    knowledge_base.add_density("water", 240.0)
+    assert knowledge_base.get_density("watermelon") == 240.0
+
+    search = StubAsyncSearch(knowledge_base, {"watermelon": 150.0})
+    densities, missing = harvest_densities(knowledge_base, search,
+                                           Counter({"water": 3, "watermelon": 2, "water chestnuts": 1}), 3)
+
+    assert search.searched == ["watermelon", "water chestnuts"]
+    assert densities == {"water": 240.0, "watermelon": 150.0}
+    assert missing == ["water chestnuts"]
+
+class SnippetBackend:
+    """Returns one result per query, with a density only for the listed ingredients."""
+
+    def __init__(self, found):
+        self.found = found
+
+    def search(self, query):
+        for ingredient, density in self.found.items():
+            if query.startswith(ingredient + " density"):
+                return [{"href": "", "title": "", "body": f"{density} g per cup"}]
+        return [{"href": "", "title": "", "body": "all about this ingredient"}]
+
+    def fetch(self, *args):
+        return None
+
+    def close(self):
+        pass
+
+def test_category_guesses_are_not_packed(tmp_path):
+    knowledge_base = KnowledgeBase(tmp_path, density_packs=[])
+    web_search = WebSearchManager(knowledge_base, delay=0, backend=SnippetBackend({"rye flour": 100.0}),
+                                  page_cache=False)
+    counts = Counter({"garlic powder": 3, "coconut sugar": 2, "sesame oil": 2, "rye flour": 1})
+
+    densities, missing = harvest_densities(knowledge_base, AsyncWebSearchManager(web_search, 2), counts, 4)
+
+    assert densities == {"rye flour": 100.0}
+    assert missing == ["garlic powder", "coconut sugar", "sesame oil"]
+    # Conversions still fall back to the guess
+    assert web_search.search_ingredient_density("garlic powder") == 120.0
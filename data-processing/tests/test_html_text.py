@@ -0,0 +1,12 @@
+# tests/test_html_text.py
+
+import pytest
+
+from src.html_text import BACKENDS, extract_text
+
+XHTML = ('<?xml version="1.0" encoding="utf-8"?>\n'
+         '<html xmlns="http://www.w3.org/1999/xhtml"><body><p>1 cup sugar</p><p>no digits</p></body></html>')
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_xml_declaration(backend):
+    assert extract_text(XHTML, backend) == '1 cup sugar'
@@ -0,0 +1,65 @@
+# tests/test_knowledge_base.py
+
+import json
+
+from src.knowledge_base import KnowledgeBase
+
+def test_journal_is_replayed_after_a_crash(tmp_path):
+    knowledge_base = KnowledgeBase(tmp_path, density_packs=[])
+    knowledge_base.add_density("amaranth", 190.0)
+    knowledge_base.add_to_cache("density_amaranth", 190.0)
+    knowledge_base.flush()
+
+    # No save(): the snapshots are stale and only the journal has the changes
+    assert "amaranth" not in json.loads((tmp_path / "densities.json").read_text())
+    reopened = KnowledgeBase(tmp_path, density_packs=[])
+    assert reopened.get_exact_density("amaranth") == 190.0
+    assert reopened.get_from_cache("density_amaranth") == 190.0
+
+def test_a_torn_last_line_is_skipped_and_appended_after(tmp_path):
+    knowledge_base = KnowledgeBase(tmp_path, density_packs=[])
+    knowledge_base.add_density("amaranth", 190.0)
+    knowledge_base.flush()
+    with open(tmp_path / "journal.jsonl", 'a') as f:
+        f.write('{"t": "densities", "k": "teff", "v"')
+
+    reopened = KnowledgeBase(tmp_path, density_packs=[])
+    assert reopened.get_exact_density("amaranth") == 190.0
+    assert reopened.get_exact_density("teff") is None
+    reopened.add_density("quinoa", 170.0)
+    reopened.flush()
+
+    again = KnowledgeBase(tmp_path, density_packs=[])
+    assert again.get_exact_density("amaranth") == 190.0
+    assert again.get_exact_density("quinoa") == 170.0
+
+def test_compaction_folds_the_journal_into_the_snapshots(tmp_path):
+    knowledge_base = KnowledgeBase(tmp_path, density_packs=[], compact_every=3)
+    knowledge_base.add_density("amaranth", 190.0)
+    knowledge_base.add_density("quinoa", 170.0)
+    assert (tmp_path / "journal.jsonl").exists()
+
+    knowledge_base.add_density("teff", 160.0)
+    assert not (tmp_path / "journal.jsonl").exists()
+    densities = json.loads((tmp_path / "densities.json").read_text())
+    assert (densities["amaranth"], densities["quinoa"], densities["teff"]) == (190.0, 170.0, 160.0)
+
+    # flush() keeps appending to the journal; save() compacts at the end of a run
+    knowledge_base.add_density("spelt", 110.0)
+    knowledge_base.flush()
+    assert (tmp_path / "journal.jsonl").exists()
+    knowledge_base.save()
+    assert not (tmp_path / "journal.jsonl").exists()
+    assert KnowledgeBase(tmp_path, density_packs=[]).get_exact_density("spelt") == 110.0
+
+def test_convert_many_matches_convert_to_metric(tmp_path):
+    knowledge_base = KnowledgeBase(tmp_path, density_packs=[])
+    measurements = [(1, "cup"), (0.25, "cup"), (3, "tablespoons"), (2, "tsp"), (500, "g"), (2.5, "pounds"),
+                    (16, "ounces"), (3, "pieces"), (2, "cloves"), (1, "handful"), (5, "liters")]
+    quantities = [quantity for quantity, _ in measurements]
+    units = [unit for _, unit in measurements]
+    expected = [knowledge_base.convert_to_metric(quantity, unit, "") for quantity, unit in measurements]
+
+    for given in (units, knowledge_base.encode_units(units)):
+        values, metric_units = knowledge_base.convert_many(quantities, given)
+        assert list(zip(values.tolist(), metric_units.tolist())) == expected
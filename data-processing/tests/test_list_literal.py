@@ -0,0 +1,57 @@
+# tests/test_list_literal.py
+
+import ast
+import math
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.list_literal import decode_list_column, decode_list_literal
+
+DATASET = Path(__file__).parent.parent / "data" / "input" / "batch-1to200.csv"
+
+@pytest.mark.parametrize("text, expected", [
+    ("['2 cups flour', 'salt']", ["2 cups flour", "salt"]),
+    ("[\"baker's yeast\", '1 egg']", ["baker's yeast", "1 egg"]),
+    (r"['baker\'s yeast']", ["baker's yeast"]),
+    (r'["say \"cheese\"", "ham"]', ['say "cheese"', "ham"]),
+    (r"['line\nbreak', 'back\\slash']", ["line\nbreak", "back\\slash"]),
+    ("['a, b', 'c']", ["a, b", "c"]),
+    ("['salt',]", ["salt"]),
+    ("[]", []),
+    ("[ ]", []),
+    ("['salt', ['pepper', 'oil']]", ["salt", ["pepper", "oil"]]),
+    ("('salt', 'pepper')", ["salt", "pepper"]),
+])
+def test_literals(text, expected):
+    assert decode_list_literal(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("salt, pepper", ["salt", " pepper"]),
+    ("['unterminated", ["['unterminated"]),
+    ("['a' + 'b']", ["['a' + 'b']"]),
+    ("__import__('os').system('true')", ["__import__('os').system('true')"]),
+    ("'just a string'", ["'just a string'"]),
+])
+def test_malformed_input_is_split_on_commas(text, expected):
+    assert decode_list_literal(text) == expected
+
+def test_column_keeps_missing_values():
+    decoded = decode_list_column(["['salt']", float("nan"), None, "[]"])
+    assert decoded[0] == ["salt"] and math.isnan(decoded[1]) and decoded[2] is None and decoded[3] == []
+
+@pytest.mark.skipif(not DATASET.exists(), reason="sample dataset not available")
+def test_matches_literal_eval_on_the_dataset():
+    df = pd.read_csv(DATASET)
+    literals = {}
+    for column in ("ingredients", "tags", "steps"):
+        for text in df[column] if column in df else []:
+            try:
+                value = ast.literal_eval(text)
+            except (ValueError, SyntaxError):
+                continue
+            if isinstance(value, list):
+                literals[text] = value
+    assert literals
+    assert decode_list_column(list(literals)) == list(literals.values())
@@ -0,0 +1,33 @@
+# tests/test_page_cache.py
+
+from src.page_cache import PageCache
+
+def test_put_same_text_again_keeps_page(tmp_path):
+    cache = PageCache(tmp_path)
+    cache.put('u', 'hello')
+    cache.put('u', 'hello', etag='"v2"')
+
+    page = cache.get('u')
+    assert page is not None
+    assert page["text"] == 'hello'
+    assert page["etag"] == '"v2"'
+    assert cache.stats()["urls"] == 1
+    assert cache.stats()["blobs"] == 1
+
+def test_put_new_text_releases_old_blob(tmp_path):
+    cache = PageCache(tmp_path)
+    cache.put('u', 'hello')
+    cache.put('u', 'goodbye')
+
+    assert cache.get('u')["text"] == 'goodbye'
+    assert cache.stats()["blobs"] == 1
+    assert len(list((tmp_path / "blobs").rglob("*.z"))) == 1
+
+def test_shared_blob_survives_other_url_update(tmp_path):
+    cache = PageCache(tmp_path)
+    cache.put('a', 'same')
+    cache.put('b', 'same')
+    cache.put('a', 'changed')
+
+    assert cache.get('b')["text"] == 'same'
+    assert cache.get('a')["text"] == 'changed'
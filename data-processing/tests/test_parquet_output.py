@@ -0,0 +1,41 @@
+# tests/test_parquet_output.py
+
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+import src.main as main
+from src.web_search import WebSearchManager
+
+class NoResultsBackend:
+    def search(self, query):
+        return []
+
+    def fetch(self, *args):
+        return None
+
+    def close(self):
+        pass
+
+def test_streamed_chunks_with_a_column_empty_at_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "create_web_search", lambda knowledge_base, *args, **kwargs: WebSearchManager(
+        knowledge_base, delay=0, backend=NoResultsBackend(), page_cache=False))
+    input_file = tmp_path / "recipes.csv"
+    input_file.write_text(
+        "name,description,minutes,ingredients,steps\n"
+        "toast,,5,\"['1 slice bread']\",[]\n"
+        "tea,,,\"['250 ml water']\",[]\n"
+        "soup,a warming soup,30,\"['500 g squash']\",[]\n"
+        "jam,,45,\"['1 kg plums']\",[]\n"
+    )
+    output_file = tmp_path / "converted.parquet"
+
+    main.process_recipes(str(input_file), str(output_file), batch_size=2, chunk_size=2,
+                         keep_columns=["description", "minutes"], output_format="parquet",
+                         row_group_size=3, knowledge_base_path=str(tmp_path / "knowledge_base"))
+
+    table = pq.read_table(output_file)
+    assert str(table.schema.field("description").type) == "string"
+    assert table.column("description").to_pylist() == [None, None, "a warming soup", None]
+    assert table.column("minutes").to_pylist() == [5.0, None, 30.0, 45.0]
+    assert [len(ingredients) for ingredients in table.column("metric_ingredients").to_pylist()] == [1, 1, 1, 1]
@@ -0,0 +1,17 @@
+# tests/test_parser.py
+
+from src.converter import RecipeConverter
+from src.knowledge_base import KnowledgeBase
+from src.parser import RecipeParser
+
+def test_parse_failures_keep_their_reason(tmp_path, capsys):
+    recipes = RecipeParser().parse_batch(["pancakes", None], ["['2 cups flour']", "['salt']"], [[], []])
+
+    assert recipes[0]["ingredients_list"] == ["2 cups flour"]
+    assert isinstance(recipes[1], AttributeError)
+
+    converter = RecipeConverter(KnowledgeBase(tmp_path, density_packs=[]), None)
+    columns = converter.convert_batch(recipes[1:], [7])
+
+    assert columns["metric_ingredients"] == ["[]"]
+    assert capsys.readouterr().out.strip() == f"Error processing recipe at index 7: {recipes[1]}"
@@ -0,0 +1,138 @@
+# tests/test_process.py
+
+import contextlib
+import importlib
+import sys
+import types
+
+import pytest
+
+import src
+
+def stub_torch():
+    """Batching is plain Python; a stand-in torch is enough to import process.py."""
+    torch = types.ModuleType("torch")
+    torch.cuda = types.SimpleNamespace(is_available=lambda: False)
+    torch.backends = types.SimpleNamespace(mps=None)
+    torch.inference_mode = contextlib.nullcontext
+    torch.float32 = "float32"
+    return torch
+
+# Modules that hold on to whichever torch they were imported with
+TORCH_MODULES = ("process", "src.model_utils")
+
+@pytest.fixture
+def modules(monkeypatch):
+    """Import process and model_utils, against a stand-in torch if it isn't installed.
+
+    The imports are undone after the test (along with the src/ entry process.py
+    adds to sys.path), so the stand-in can't leak into other tests.
+    """
+    try:
+        import torch
+    except ImportError:
+        monkeypatch.setitem(sys.modules, "torch", stub_torch())
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    saved = {name: sys.modules.pop(name) for name in TORCH_MODULES if name in sys.modules}
+    had_model_utils = hasattr(src, "model_utils")
+
+    yield types.SimpleNamespace(process=importlib.import_module("process"),
+                                model_utils=importlib.import_module("src.model_utils"))
+
+    for name in TORCH_MODULES:
+        sys.modules.pop(name, None)
+    sys.modules.update(saved)
+    if "src.model_utils" in saved:
+        src.model_utils = saved["src.model_utils"]
+    elif not had_model_utils:
+        del src.model_utils
+
+class StubEncoding(dict):
+    def to(self, device):
+        self.device = device
+        return self
+
+class StubTokenizer:
+    """Whitespace tokenizer that pads like a Hugging Face tokenizer."""
+
+    pad_token = None
+    eos_token = "<eos>"
+    pad_token_id = 0
+
+    def __init__(self):
+        self.padding_side = "right"
+        self.padded_sides = []
+
+    def __call__(self, prompts, return_tensors=None, padding=False):
+        ids = [prompt.split() for prompt in prompts]
+        if padding:
+            self.padded_sides.append(self.padding_side)
+            width = max(len(tokens) for tokens in ids)
+            ids = [["<pad>"] * (width - len(tokens)) + tokens for tokens in ids]
+        return StubEncoding(input_ids=ids)
+
+    def batch_decode(self, outputs, skip_special_tokens=True):
+        return [" ".join(token for token in tokens if token != "<pad>") for tokens in outputs]
+
+class StubModel:
+    """Answers every prompt with its ingredient line, recording the batches it sees."""
+
+    def __init__(self):
+        self.batches = []
+
+    def generate(self, input_ids, max_new_tokens, pad_token_id):
+        self.batches.append([len([t for t in tokens if t != "<pad>"]) for tokens in input_ids])
+        return [tokens + ["->", "done"] for tokens in input_ids]
+
+def expected(process, ingredient):
+    return " ".join(process.build_prompt(str(ingredient)).split() + ["->", "done"])
+
+def test_generate_batched_dedupes_sorts_and_scatters(modules):
+    process = modules.process
+    rows = ["['2 cups flour']", "['salt']", "['2 cups flour']", float('nan'),
+            "['a', 'b', 'c', 'd', 'e']", "['salt']"]
+    model, tokenizer = StubModel(), StubTokenizer()
+
+    results = process.generate_batched(model, tokenizer, rows, batch_size=2)
+
+    # One prompt per distinct text, longest first, results back in row order
+    assert results == [expected(process, row) for row in rows]
+    assert sum(len(batch) for batch in model.batches) == 4
+    lengths = [length for batch in model.batches for length in batch]
+    assert lengths == sorted(lengths, reverse=True)
+
+    # Batches are padded on the left and the tokenizer is left as it was
+    assert tokenizer.padded_sides == ["left", "left"]
+    assert tokenizer.padding_side == "right"
+    assert tokenizer.pad_token == "<eos>"
+
+def test_generate_batched_restores_padding_side_on_error(modules):
+    class FailingModel(StubModel):
+        def generate(self, **kwargs):
+            raise RuntimeError("out of memory")
+
+    tokenizer = StubTokenizer()
+    try:
+        modules.process.generate_batched(FailingModel(), tokenizer, ["['salt']"])
+    except RuntimeError:
+        pass
+    assert tokenizer.padding_side == "right"
+
+def test_load_model_default_on_cpu_skips_unsloth(modules, monkeypatch):
+    model_utils = modules.model_utils
+    loaded = {}
+
+    class Auto:
+        @staticmethod
+        def from_pretrained(name):
+            loaded.setdefault("names", []).append(name)
+            return types.SimpleNamespace(to=lambda device: loaded.setdefault("model", types.SimpleNamespace(
+                device=device, eval=lambda: None)))
+
+    monkeypatch.setitem(sys.modules, "transformers", types.SimpleNamespace(
+        AutoModelForCausalLM=Auto, AutoTokenizer=Auto))
+    monkeypatch.setitem(sys.modules, "unsloth", None)
+
+    model, _ = model_utils.load_model(None, "cpu")
+    assert loaded["names"] == [model_utils.CPU_LLAMA_MODEL, model_utils.CPU_LLAMA_MODEL]
+    assert model.device == "cpu"
@@ -0,0 +1,74 @@
+# tests/test_search_cache.py
+
+from src.search_cache import MISSING, SearchCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_entries_expire_after_their_ttl():
+    clock = Clock()
+    cache = SearchCache(ttl=60, negative_ttl=45, clock=clock)
+    cache.set("density_oats", 90.0)
+    cache.set("density_gravel", None, negative=True)
+
+    clock.now += 30
+    assert cache.get("density_oats") == 90.0
+    assert cache.get("density_gravel") is None
+    assert cache.get("density_rice") is MISSING
+
+    clock.now += 31
+    assert cache.get("density_oats") is MISSING
+    assert cache.get("density_gravel") is MISSING
+    assert cache.stats()["expirations"] == 2
+    assert len(cache) == 0
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SearchCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+def test_negative_entries_are_told_apart_from_misses():
+    cache = SearchCache()
+    cache.set("density_gravel", None, negative=True)
+
+    assert cache.get("density_gravel") is None
+    assert cache.get("density_sand") is MISSING
+    assert cache.get("density_sand", "default") == "default"
+    stats = cache.stats()
+    assert (stats["negative_hits"], stats["misses"], stats["hits"]) == (1, 2, 0)
+
+def test_peek_neither_counts_nor_refreshes():
+    cache = SearchCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.peek("a") == 1
+    assert cache.peek("z") is MISSING
+    cache.set("c", 3)
+
+    assert "a" not in cache
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == 0
+
+def test_snapshots_round_trip_without_expired_entries():
+    clock = Clock()
+    cache = SearchCache(ttl=60, clock=clock)
+    cache.set("old", 1)
+    clock.now += 50
+    cache.set("new", 2)
+    clock.now += 20
+
+    restored = SearchCache(clock=clock)
+    restored.load({**cache.to_dict(), "legacy": "2 cups flour"})
+    assert restored.get("old") is MISSING
+    assert restored.get("new") == 2
+    assert restored.get("legacy") == "2 cups flour"
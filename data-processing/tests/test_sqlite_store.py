@@ -0,0 +1,75 @@
+# tests/test_sqlite_store.py
+
+import json
+
+from src.sqlite_store import SQLiteKnowledgeBase
+
+def test_opens_over_a_json_search_cache(tmp_path):
+    (tmp_path / "search_cache.json").write_text(json.dumps({
+        "density_oats": {"value": 90.0, "expires": None, "negative": False},
+        "density_gravel": {"value": None, "expires": None, "negative": True},
+        "quantity_bread_flour": "2 cups flour"
+    }))
+    knowledge_base = SQLiteKnowledgeBase(tmp_path)
+
+    assert knowledge_base.get_from_cache("density_oats") == 90.0
+    assert knowledge_base.get_from_cache("density_gravel", "missing") is None
+    assert knowledge_base.get_from_cache("quantity_bread_flour") == "2 cups flour"
+    assert knowledge_base.peek_cache("density_rice", "missing") == "missing"
+    knowledge_base.close()
+
+def test_seeds_from_the_json_snapshots(tmp_path):
+    (tmp_path / "densities.json").write_text(json.dumps({"oats": 90.0}))
+    conversions = SQLiteKnowledgeBase(tmp_path / "defaults")._initial_conversions()
+    conversions["volume"]["mug"] = 350.0
+    (tmp_path / "conversions.json").write_text(json.dumps(conversions))
+    (tmp_path / "search_cache.json").write_text(json.dumps({"density_oats": 90.0}))
+
+    knowledge_base = SQLiteKnowledgeBase(tmp_path, density_packs=[])
+    assert knowledge_base.get_exact_density("oats") == 90.0
+    assert knowledge_base.get_exact_density("flour") is None
+    assert knowledge_base.convert_to_metric(1, "mug", "water") == (0.35, "L")
+    assert knowledge_base.get_from_cache("density_oats") == 90.0
+    knowledge_base.close()
+
+    # Seeding happens once; later edits to the snapshots are not imported again
+    (tmp_path / "densities.json").write_text(json.dumps({"oats": 1.0}))
+    knowledge_base = SQLiteKnowledgeBase(tmp_path, density_packs=[])
+    assert knowledge_base.get_exact_density("oats") == 90.0
+    knowledge_base.close()
+
+def test_a_second_instance_sees_saved_rows(tmp_path):
+    writer = SQLiteKnowledgeBase(tmp_path, density_packs=[])
+    reader = SQLiteKnowledgeBase(tmp_path, density_packs=[])
+
+    writer.add_density("amaranth", 110.0)
+    writer.add_to_cache("density_amaranth", 110.0)
+    writer.add_negative_to_cache("density_gravel")
+    assert reader.get_density("amaranth") != 110.0
+    assert reader.get_from_cache("density_amaranth", "missing") == "missing"
+
+    writer.save()
+    assert reader.get_density("amaranth") == 110.0
+    assert reader.get_from_cache("density_amaranth") == 110.0
+    assert reader.get_from_cache("density_gravel", "missing") is None
+    writer.close()
+    reader.close()
+
+def test_cache_keeps_the_most_recently_used_entries(tmp_path):
+    knowledge_base = SQLiteKnowledgeBase(tmp_path, density_packs=[], cache_size=2, negative_ttl=-1)
+    knowledge_base.add_to_cache("a", 1)
+    knowledge_base.add_to_cache("b", 2)
+    knowledge_base.save()
+
+    knowledge_base.get_from_cache("a")
+    knowledge_base.add_to_cache("c", 3)
+    knowledge_base.add_negative_to_cache("expired")
+    knowledge_base.save()
+
+    assert knowledge_base.get_from_cache("b", "missing") == "missing"
+    assert knowledge_base.get_from_cache("a") == 1
+    assert knowledge_base.get_from_cache("c") == 3
+    assert knowledge_base.get_from_cache("expired", "missing") == "missing"
+    stats = knowledge_base.cache_stats()
+    assert (stats["entries"], stats["evictions"]) == (2, 1)
+    knowledge_base.close()
@@ -0,0 +1,91 @@
+# tests/test_web_search.py
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.backends import FetchedPage
+from src.knowledge_base import KnowledgeBase
+from src.web_search import WebSearchManager
+
+class StubBackend:
+    """Answers every density query with the same snippet, counting searches."""
+
+    def __init__(self, wait=None):
+        self.wait = wait
+        self.searches = 0
+
+    def search(self, query):
+        self.searches += 1
+        if self.wait is not None:
+            self.wait.wait(5)
+        return [{"href": "", "title": "", "body": "a cup of it weighs 150 grams"}]
+
+    def fetch(self, *args):
+        return None
+
+    def close(self):
+        pass
+
+def test_a_miss_is_counted_once(tmp_path):
+    knowledge_base = KnowledgeBase(tmp_path, density_packs=[])
+    web_search = WebSearchManager(knowledge_base, delay=0, backend=StubBackend(), page_cache=False)
+
+    assert web_search.search_ingredient_density("oats") == 150.0
+    assert web_search.search_ingredient_density("oats") == 150.0
+
+    stats = knowledge_base.cache_stats()
+    assert (stats["misses"], stats["hits"]) == (1, 1)
+
+def test_concurrent_searches_share_one_lookup(tmp_path):
+    knowledge_base = KnowledgeBase(tmp_path, density_packs=[])
+    release = threading.Event()
+    backend = StubBackend(wait=release)
+    web_search = WebSearchManager(knowledge_base, delay=0, backend=backend, page_cache=False)
+
+    ingredients = ["oats", "rice", "lentils"] * 4
+    with ThreadPoolExecutor(max_workers=len(ingredients)) as pool:
+        futures = [pool.submit(web_search.search_ingredient_density, ingredient) for ingredient in ingredients]
+        release.set()
+        densities = [future.result() for future in futures]
+
+    assert densities == [150.0] * len(ingredients)
+    assert backend.searches == 3
+    assert knowledge_base.get_exact_density("rice") == 150.0
+    stats = knowledge_base.cache_stats()
+    assert stats["hits"] + stats["misses"] == len(ingredients)
+    knowledge_base.save()
+    assert set(KnowledgeBase(tmp_path, density_packs=[]).search_cache.to_dict()) == {
+        "density_oats", "density_rice", "density_lentils"
+    }
+
+class PagesBackend(StubBackend):
+    """Serves fixed results and page bodies, recording which pages were fetched."""
+
+    def __init__(self, results, pages):
+        super().__init__()
+        self.results = results
+        self.pages = pages
+        self.fetched = []
+
+    def search(self, query):
+        return self.results
+
+    def fetch(self, url, headers=None, cancelled=None):
+        self.fetched.append(url)
+        return FetchedPage(200, self.pages[url].encode())
+
+def test_an_earlier_page_wins_over_a_later_snippet(tmp_path):
+    results = [
+        {"href": "http://a", "title": "", "body": "nothing here"},
+        {"href": "http://b", "title": "", "body": "a cup of it weighs 150 grams"},
+        {"href": "http://c", "title": "", "body": ""},
+    ]
+    backend = PagesBackend(results, {"http://a": "<p>100 g per cup</p>", "http://b": "", "http://c": ""})
+    web_search = WebSearchManager(KnowledgeBase(tmp_path, density_packs=[]), delay=0,
+                                  backend=backend, page_cache=False)
+
+    assert web_search._extract_density_from_results(results, "oats") == 100.0
+    assert backend.fetched == ["http://a"]
+
+    backend.pages["http://a"] = "<p>nothing</p>"
+    assert web_search._extract_density_from_results(results, "oats") == 150.0
@@ -0,0 +1,110 @@
+# tests/test_workers.py
+
+import pandas as pd
+
+import src.main as main
+from src.backends import RecordBackend
+from src.knowledge_base import KnowledgeBase
+from src.web_search import WebSearchManager
+
+# Each pair of rows is one shard, and no ingredient is shared between shards
+RECIPES = (
+    "name,ingredients,steps\n"
+    "porridge,\"['1 cup zorbleberry flakes', 'quibble salt to taste']\",[]\n"
+    "stew,\"['2 cups frondle beans', '1 tablespoon marrowick oil']\",[]\n"
+    "cake,\"['1 cup plimsy sugar', 'glimmet spice to taste']\",[]\n"
+    "salad,\"['3 cups wendle leaves', '2 tablespoons trossle vinegar']\",[]\n"
+)
+
+class RecipeBackend:
+    """Answers quantity queries with two cups and density queries with 150 grams a cup."""
+
+    def search(self, query):
+        if " how much" in query:
+            ingredient = query.split(" recipe ")[1].replace(" how much", "")
+            return [{"href": "", "title": "", "body": f"use 2 cups {ingredient} here"}]
+        return [{"href": "", "title": "", "body": "a cup of it weighs 150 grams"}]
+
+    def fetch(self, *args):
+        return None
+
+    def close(self):
+        pass
+
+def record_sequential_run(tmp_path, monkeypatch):
+    """Convert the recipes one process at a time, recording the searches as fixtures.
+
+    Worker processes can't see a patched backend, so the other modes replay
+    the fixtures instead.
+    """
+    input_file = tmp_path / "recipes.csv"
+    input_file.write_text(RECIPES)
+    fixtures = tmp_path / "fixtures"
+    with monkeypatch.context() as patch:
+        patch.setattr(main, "create_web_search", lambda knowledge_base, *args, **kwargs: WebSearchManager(
+            knowledge_base, delay=0, backend=RecordBackend(RecipeBackend(), str(fixtures)), page_cache=False))
+        main.process_recipes(str(input_file), str(tmp_path / "sequential.csv"), batch_size=2,
+                             knowledge_base_path=str(tmp_path / "sequential"))
+    return input_file, fixtures
+
+def spy_on_deltas(monkeypatch):
+    """Collect the non-empty deltas merged into the main knowledge base."""
+    deltas = []
+    apply_delta = KnowledgeBase.apply_delta
+
+    def spy(self, delta):
+        if delta:
+            deltas.append(list(delta))
+        apply_delta(self, delta)
+
+    monkeypatch.setattr(KnowledgeBase, "apply_delta", spy)
+    return deltas
+
+def assert_matches_sequential(tmp_path, name):
+    assert pd.read_csv(tmp_path / f"{name}.csv").equals(pd.read_csv(tmp_path / "sequential.csv"))
+
+    sequential = KnowledgeBase(tmp_path / "sequential", density_packs=[])
+    knowledge_base = KnowledgeBase(tmp_path / name, density_packs=[])
+    assert knowledge_base.search_cache.to_dict().keys() == sequential.search_cache.to_dict().keys()
+    assert knowledge_base._own_densities() == sequential._own_densities()
+
+def assert_merged_once(tmp_path, deltas):
+    """One delta per shard, and each discovery merged from exactly one of them."""
+    sequential = KnowledgeBase(tmp_path / "sequential", density_packs=[])
+    assert len(deltas) == 2
+    records = [(table, key) for delta in deltas for table, key, _ in delta]
+    assert len(records) == len(set(records))
+    assert {key for table, key in records if table == "search_cache"} == sequential.search_cache.to_dict().keys()
+
+def test_workers_match_the_sequential_run(tmp_path, monkeypatch):
+    input_file, fixtures = record_sequential_run(tmp_path, monkeypatch)
+    deltas = spy_on_deltas(monkeypatch)
+
+    main.process_recipes(str(input_file), str(tmp_path / "workers.csv"), batch_size=2,
+                         search_mode="replay", fixtures=str(fixtures), workers=2, shard_size=2,
+                         knowledge_base_path=str(tmp_path / "workers"))
+
+    assert_matches_sequential(tmp_path, "workers")
+    assert_merged_once(tmp_path, deltas)
+
+def test_offline_first_matches_the_sequential_run(tmp_path, monkeypatch):
+    input_file, fixtures = record_sequential_run(tmp_path, monkeypatch)
+    deltas = spy_on_deltas(monkeypatch)
+
+    main.process_recipes(str(input_file), str(tmp_path / "offline_first.csv"), batch_size=2,
+                         search_mode="replay", fixtures=str(fixtures), offline_first=True,
+                         knowledge_base_path=str(tmp_path / "offline_first"))
+
+    assert_matches_sequential(tmp_path, "offline_first")
+    assert deltas == []
+
+def test_offline_first_workers_match_the_sequential_run(tmp_path, monkeypatch):
+    input_file, fixtures = record_sequential_run(tmp_path, monkeypatch)
+    deltas = spy_on_deltas(monkeypatch)
+
+    main.process_recipes(str(input_file), str(tmp_path / "offline_first_workers.csv"), batch_size=2,
+                         search_mode="replay", fixtures=str(fixtures), offline_first=True, workers=2,
+                         shard_size=2, knowledge_base_path=str(tmp_path / "offline_first_workers"))
+
+    assert_matches_sequential(tmp_path, "offline_first_workers")
+    assert_merged_once(tmp_path, deltas)
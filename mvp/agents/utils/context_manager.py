@@ -1,6 +1,12 @@
 from typing import Dict, Any, List, Optional, Set
+import re
 import time
 
+# Measurement keywords in the order they are reported, compiled once for entity extraction.
+# The lookahead also finds overlapping keywords, like a substring test per keyword would.
+MEASUREMENT_KEYWORDS = ["cup", "tablespoon", "teaspoon", "gram", "kg", "ounce", "pound", "ml", "liter"]
+MEASUREMENT_PATTERN = re.compile("(?=(" + "|".join(MEASUREMENT_KEYWORDS) + "))")
+
 class ContextManager:
     """Manages context across agent interactions."""
     
@@ -97,10 +103,8 @@ class ContextManager:
         }
         
         # Basic extraction of measurement patterns
-        measurement_keywords = ["cup", "tablespoon", "teaspoon", "gram", "kg", "ounce", "pound", "ml", "liter"]
-        for keyword in measurement_keywords:
-            if keyword in message.lower():
-                entities["measurements"].append(keyword)
+        found = set(MEASUREMENT_PATTERN.findall(message.lower()))
+        entities["measurements"] = [keyword for keyword in MEASUREMENT_KEYWORDS if keyword in found]
         
         # Track if this seems like a conversion request
         conversion_keywords = ["convert", "conversion", "change", "metric", "imperial"]